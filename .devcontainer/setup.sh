@@ -10,6 +10,8 @@ sudo apt-get install -y \
     poppler-utils \
     tesseract-ocr \
     tesseract-ocr-eng \
+    libtesseract-dev \
+    libleptonica-dev \
     libsm6 \
     libxext6 \
     libxrender-dev \
@@ -4,7 +4,6 @@ import os
 import tempfile
 import logging
 from typing import Dict, Any
-from pdf2image import convert_from_path
 import requests
 
 # Configure logging
@@ -0,0 +1,34 @@
+"""
+Gunicorn settings for the LayoutLM service container.
+
+Usage: gunicorn -c gunicorn_conf.py main:app
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 3002)}"
+
+# Worker processes OCR pages in parallel; each serves 2 requests via threads
+workers = int(os.environ.get("WEB_CONCURRENCY", max(2, (os.cpu_count() or 1) // 2)))
+threads = 2
+worker_class = "gthread"
+
+# Each worker imports the app and loads LayoutLM itself. Loading in the master
+# would create the CUDA context / FP16 weights and torch's OpenMP thread pools
+# before the fork, where they are unusable, and the INT8-quantized copy is
+# per process anyway.
+preload_app = False
+
+# First requests on a cold page can spend a while in OCR + inference
+timeout = 120
+
+# main.py splits torch threads across workers using WEB_CONCURRENCY
+os.environ.setdefault("WEB_CONCURRENCY", str(workers))
+
+
+def post_worker_init(worker):
+    """Load and warm the model in each new worker, in the background."""
+    import main
+
+    if main.PRELOAD_MODEL:
+        main.start_background_warmup()
@@ -6,24 +6,68 @@ Runs on port 3002, called by Lambda backend
 """
 
 import os
-import sys
+import atexit
 import logging
 import tempfile
-import base64
+import binascii
+import hashlib
+import io
 import json
-from typing import Dict, Any, List
+import re
+import threading
+from typing import Dict, Any, List, Optional
 from pathlib import Path
 from difflib import SequenceMatcher
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from itertools import compress, islice
+from bisect import bisect_right
+from collections import OrderedDict, deque
+from contextlib import contextmanager, suppress
 
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+import numpy as np
+import fitz  # PyMuPDF
 from PIL import Image
-from pdf2image import convert_from_path
 from transformers import pipeline, LayoutLMv2Processor, LayoutLMv2ForQuestionAnswering
 import torch
+
+# Tesseract's own OpenMP threading slows OCR down once pages and strips are
+# already OCR'd in parallel, so it gets one thread. This must stay below the
+# torch/transformers imports: the OpenMP runtime bundled with torch reads the
+# environment once when it is loaded, so inference keeps its TORCH_NUM_THREADS
+# intra-op threads. The limit reaches the tesseract CLI subprocesses and the
+# libtesseract OpenMP runtime, which is only loaded with tesserocr below.
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
 import pytesseract
 
+try:
+    from tesserocr import PyTessBaseAPI, PSM, OEM, RIL, iterate_level
+except ImportError:  # In-process bindings need libtesseract - fall back to the CLI
+    PyTessBaseAPI = None
+
+try:
+    from rapidfuzz import fuzz, process
+except ImportError:  # Fuzzy matching falls back to difflib
+    fuzz = process = None
+
+try:
+    import re2  # google-re2: linear-time matching, no catastrophic backtracking
+except ImportError:  # OCR fallback patterns use the combined stdlib regex
+    re2 = None
+
+try:
+    import orjson
+except ImportError:  # Large responses fall back to Flask's json encoder
+    orjson = None
+
+try:
+    import pybase64  # SIMD (SSSE3/AVX2/NEON) base64 decoder
+except ImportError:  # Payloads are decoded with binascii
+    pybase64 = None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -61,16 +105,93 @@ def after_request(response):
     return response
 
 
+def json_response(payload: Dict[str, Any]):
+    """
+    jsonify() for large payloads - serialized with orjson when installed.
+
+    Used for responses carrying thousands of OCR boxes, where the stdlib
+    encoder dominates response time. Small/error responses keep jsonify().
+    """
+    if orjson is None:
+        return jsonify(payload)
+    return app.response_class(orjson.dumps(payload), mimetype="application/json")
+
+
 # Global model variables (lazy loaded)
 _doc_qa_pipeline = None
 _layoutlm_processor = None
 _layoutlm_model = None
 
+
+# In-process Tesseract engines, pooled per (psm, oem). An engine is not
+# thread-safe, so each one is checked out by a single OCR call at a time.
+# Each engine holds its own copy of the traineddata, so at most
+# TESSERACT_MAX_ENGINES run at once (further OCR calls wait for one) and at
+# most that many are kept idle - surplus engines are freed on return.
+TESSERACT_MAX_ENGINES = int(
+    os.environ.get("TESSERACT_MAX_ENGINES", os.cpu_count() or 1)
+)
+_tess_pools = {}
+_tess_pools_lock = threading.Lock()
+_tess_engine_slots = threading.BoundedSemaphore(TESSERACT_MAX_ENGINES)
+
+
+def init_tesseract_api():
+    """Pre-warm a default in-process Tesseract engine, or return False to use the CLI."""
+    if PyTessBaseAPI is None:
+        return False
+    try:
+        _tess_pools[(PSM.AUTO, OEM.DEFAULT)] = [PyTessBaseAPI(psm=PSM.AUTO)]
+        logger.info("✓ In-process Tesseract engine (tesserocr) initialized")
+        return True
+    except RuntimeError as e:
+        logger.warning(f"tesserocr init failed, falling back to pytesseract: {e}")
+        return False
+
+
+def close_tesseract_engines():
+    """Release every idle pooled Tesseract engine (registered with atexit)."""
+    with _tess_pools_lock:
+        engines = [api for pool in _tess_pools.values() for api in pool]
+        _tess_pools.clear()
+    for api in engines:
+        api.End()
+
+
+_use_tesserocr = init_tesseract_api()
+if _use_tesserocr:
+    atexit.register(close_tesseract_engines)
+
+# pytesseract hands each image to the tesseract CLI as a temp PNG. When
+# tesserocr is unavailable those PNGs are written to RAM-backed /dev/shm, as
+# long as it has this much room left - Docker's default /dev/shm is only 64MB.
+OCR_SHM_DIR = "/dev/shm"
+OCR_SHM_MIN_FREE_BYTES = 32 * 1024 * 1024
+
+
+def ocr_temp_dir() -> Optional[str]:
+    """/dev/shm if it is writable and has room for OCR input PNGs, else None."""
+    try:
+        shm = os.statvfs(OCR_SHM_DIR)
+    except OSError:
+        return None
+    if shm.f_bavail * shm.f_frsize < OCR_SHM_MIN_FREE_BYTES:
+        return None
+    return OCR_SHM_DIR if os.access(OCR_SHM_DIR, os.W_OK) else None
+
+
 # Template storage directory
 TEMPLATE_DIR = Path("/tmp/invoice_templates")
 TEMPLATE_DIR.mkdir(exist_ok=True)
 
 
+def sanitize_vendor_name(vendor_name: str) -> str:
+    """Lowercase a vendor name and make it safe to use as a template filename."""
+    return "".join(
+        c if c.isalnum() or c in "_-" else "_" for c in vendor_name.strip().lower()
+    )
+
+
 def save_template(vendor_name: str, template_data: Dict[str, Any]) -> bool:
     """Save a learned template for reuse."""
     try:
@@ -78,8 +199,12 @@ def save_template(vendor_name: str, template_data: Dict[str, Any]) -> bool:
         template_data["last_updated"] = datetime.now().isoformat()
         template_data["version"] = template_data.get("version", 1) + 1
 
-        with open(template_file, "w") as f:
+        # Write to a temp file and swap it in, so readers never see a partial
+        # template and a crash mid-write leaves the old one intact
+        tmp_file = template_file.with_suffix(".json.tmp")
+        with open(tmp_file, "w") as f:
             json.dump(template_data, f, indent=2)
+        os.replace(tmp_file, template_file)
 
         logger.info(f"[Template] Saved template for vendor: {vendor_name}")
         return True
@@ -88,18 +213,42 @@ def save_template(vendor_name: str, template_data: Dict[str, Any]) -> bool:
         return False
 
 
+# Parsed templates keyed by vendor, each stored with the file's mtime so a
+# re-saved template is re-read. Cached templates are shared: callers must not
+# modify them.
+TEMPLATE_CACHE_MAX_ENTRIES = 128
+_template_cache = OrderedDict()
+_template_cache_lock = threading.Lock()
+
+
 def load_template(vendor_name: str) -> Dict[str, Any]:
-    """Load a saved template."""
+    """Load a saved template (memoized until the file changes)."""
     try:
         template_file = TEMPLATE_DIR / f"{vendor_name}.json"
-        if template_file.exists():
-            with open(template_file, "r") as f:
-                template = json.load(f)
-            logger.info(
-                f"[Template] Loaded template for vendor: {vendor_name} (v{template.get('version', 1)})"
-            )
-            return template
-        return None
+        try:
+            mtime = template_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            with _template_cache_lock:
+                _template_cache.pop(vendor_name, None)
+            return None
+
+        with _template_cache_lock:
+            entry = _template_cache.get(vendor_name)
+            if entry is not None and entry[0] == mtime:
+                _template_cache.move_to_end(vendor_name)
+                return entry[1]
+
+        with open(template_file, "r") as f:
+            template = json.load(f)
+        logger.info(
+            f"[Template] Loaded template for vendor: {vendor_name} (v{template.get('version', 1)})"
+        )
+        with _template_cache_lock:
+            _template_cache[vendor_name] = (mtime, template)
+            _template_cache.move_to_end(vendor_name)
+            while len(_template_cache) > TEMPLATE_CACHE_MAX_ENTRIES:
+                _template_cache.popitem(last=False)
+        return template
     except Exception as e:
         logger.error(f"[Template] Failed to load template: {e}")
         return None
@@ -114,20 +263,404 @@ def list_templates() -> List[str]:
         return []
 
 
+# Content-addressed cache of /extract responses - retried or re-uploaded
+# documents skip OCR and inference entirely
+RESULT_CACHE_DIR = Path("/tmp/extract_cache")
+RESULT_CACHE_DIR.mkdir(exist_ok=True)
+RESULT_CACHE_MAX_ENTRIES = 256
+
+# Bump when a code change alters /extract output, so results cached on disk
+# by an older deploy are not served
+RESULT_CACHE_VERSION = 1
+
+
+def result_cache_fingerprint() -> list:
+    """Model and settings that change /extract output for the same request."""
+    return [
+        RESULT_CACHE_VERSION,
+        LAYOUTLM_MODEL_ID,
+        QUANTIZE_MODEL,
+        torch.cuda.is_available(),  # CUDA runs the model in FP16
+        OCR_MAX_EDGE,
+        OCR_BINARIZE,
+        OCR_DESKEW,
+        OCR_PATTERN_SHORTCUT,
+    ]
+
+
+def result_cache_key(
+    doc_data: bytes, doc_format: str, custom_fields, pages=None, template=None
+) -> str:
+    """Hash the document bytes together with the request options and settings."""
+    options = [result_cache_fingerprint(), doc_format, custom_fields or []]
+    if pages:
+        options.append(pages)
+    if template:
+        # Re-saving a template updates last_updated, invalidating old results
+        options.append([template.get("vendor_name"), template.get("last_updated")])
+    key = hashlib.blake2b(doc_data, digest_size=20)
+    key.update(json.dumps(options, sort_keys=True).encode())
+    return key.hexdigest()
+
+
+def load_cached_result(cache_key: str) -> Dict[str, Any]:
+    """Load a cached extraction response, or None on a miss."""
+    try:
+        cache_file = RESULT_CACHE_DIR / f"{cache_key}.json"
+        with open(cache_file, "r") as f:
+            result = json.load(f)
+        cache_file.touch()  # Keep recently used entries out of pruning
+        return result
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.error(f"[Cache] Failed to load cached result: {e}")
+        return None
+
+
+def save_cached_result(cache_key: str, result: Dict[str, Any]):
+    """Store an extraction response, evicting the least recently used entries."""
+    try:
+        cache_file = RESULT_CACHE_DIR / f"{cache_key}.json"
+        tmp_file = cache_file.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(result, f)
+        os.replace(tmp_file, cache_file)  # Readers never see a partial file
+
+        entries = list(RESULT_CACHE_DIR.glob("*.json"))
+        if len(entries) > RESULT_CACHE_MAX_ENTRIES:
+            entries.sort(key=lambda f: f.stat().st_mtime)
+            for old_file in entries[: len(entries) - RESULT_CACHE_MAX_ENTRIES]:
+                old_file.unlink(missing_ok=True)
+    except Exception as e:
+        logger.error(f"[Cache] Failed to save result: {e}")
+
+
+def decode_document_data(b64_data: str) -> bytes:
+    """
+    Decode a base64 document payload, with or without a data-URL prefix
+    (e.g. "data:image/png;base64,...").
+
+    Uses pybase64's SIMD decoder when installed (several times faster on
+    multi-MB PDFs), otherwise calls binascii's C decoder directly -
+    base64.b64decode wraps the same function with extra argument handling.
+    Both skip non-alphabet characters such as line breaks.
+    """
+    if b64_data.startswith("data:"):
+        b64_data = b64_data.partition(",")[2]
+    if pybase64 is not None:
+        return pybase64.b64decode(b64_data, validate=False)
+    return binascii.a2b_base64(b64_data)
+
+
+# MuPDF contexts are not thread-safe; Flask serves requests on threads
+_pdf_lock = threading.Lock()
+
+# Recently opened PDFs - the UI sends the same document for every bbox
+# re-extraction, text detection and page, so its xref/page tree is parsed
+# once. Only used under _pdf_lock.
+PDF_DOC_CACHE_MAX_ENTRIES = 4
+_pdf_doc_cache = OrderedDict()
+
+
+def open_pdf_cached(pdf_data: bytes):
+    """
+    fitz.open() a PDF from memory, reusing a recently opened document.
+
+    The caller must hold _pdf_lock while using the returned document.
+    """
+    key = hashlib.blake2b(pdf_data, digest_size=20).hexdigest()
+    doc = _pdf_doc_cache.get(key)
+    if doc is not None:
+        _pdf_doc_cache.move_to_end(key)
+        return doc
+
+    doc = fitz.open(stream=pdf_data, filetype="pdf")
+    _pdf_doc_cache[key] = doc
+    while len(_pdf_doc_cache) > PDF_DOC_CACHE_MAX_ENTRIES:
+        _, evicted = _pdf_doc_cache.popitem(last=False)
+        evicted.close()
+    return doc
+
+
+def render_pdf_page(
+    pdf_data: bytes,
+    page_num: int = 1,
+    dpi: int = 150,
+    max_height: int = None,
+    gray: bool = False,
+):
+    """
+    Render one PDF page to a PIL image in memory using PyMuPDF.
+
+    Args:
+        max_height: Optional pixel height cap - tall pages are rendered at a
+                    lower resolution instead of being downscaled afterwards
+        gray: Rasterize straight to an "L" image (one byte per pixel) instead
+              of RGB
+
+    Returns:
+        PIL Image, or None if the PDF has no such page
+    """
+    with _pdf_lock:
+        doc = open_pdf_cached(pdf_data)
+        if not 1 <= page_num <= doc.page_count:
+            return None
+        page = doc.load_page(page_num - 1)
+        zoom = dpi / 72
+        if max_height:
+            zoom = min(zoom, max_height / page.rect.height)
+        pix = page.get_pixmap(
+            matrix=fitz.Matrix(zoom, zoom),
+            colorspace=fitz.csGRAY if gray else fitz.csRGB,
+            alpha=False,
+        )
+
+    return Image.frombytes("L" if gray else "RGB", (pix.width, pix.height), pix.samples)
+
+
+def bbox_to_pixels(bbox, img_width: int, img_height: int) -> tuple:
+    """
+    Convert a normalized [0-1000] bbox to pixel coordinates inside the image.
+
+    Returns:
+        (x1, y1, x2, y2) ints clamped to the image bounds
+    """
+    x1 = int((bbox[0] / 1000.0) * img_width)
+    y1 = int((bbox[1] / 1000.0) * img_height)
+    x2 = int((bbox[2] / 1000.0) * img_width)
+    y2 = int((bbox[3] / 1000.0) * img_height)
+    x1, x2 = max(0, min(x1, img_width)), max(0, min(x2, img_width))
+    y1, y2 = max(0, min(y1, img_height)), max(0, min(y2, img_height))
+    return x1, y1, x2, y2
+
+
+def render_pdf_region(
+    pdf_data: bytes, page_num: int, bbox, dpi: int = 150, min_height: int = None
+):
+    """
+    Rasterize only a bbox of one PDF page, in grayscale.
+
+    The pixels match a crop of render_pdf_page() at the same dpi, but MuPDF
+    skips rasterizing the rest of the page.
+
+    Args:
+        bbox: [x1, y1, x2, y2] normalized to 0-1000
+        min_height: Optional minimum region height in pixels - short regions
+                    are rasterized at a higher zoom instead of being
+                    upscaled afterwards. Returned coordinates stay at dpi.
+
+    Returns:
+        (L image of the region, (page_width, page_height) in pixels,
+        (x1, y1, x2, y2) region in page pixels), or None if the PDF has no
+        such page
+    """
+    with _pdf_lock:
+        doc = open_pdf_cached(pdf_data)
+        if not 1 <= page_num <= doc.page_count:
+            return None
+        page = doc.load_page(page_num - 1)
+        matrix = fitz.Matrix(dpi / 72, dpi / 72)
+        page_pixels = (page.rect * matrix).irect
+        img_width, img_height = page_pixels.width, page_pixels.height
+        pixel_box = bbox_to_pixels(bbox, img_width, img_height)
+        clip = fitz.Rect(pixel_box) * ~matrix
+        region_height = pixel_box[3] - pixel_box[1]
+        if min_height and 0 < region_height < min_height:
+            zoom = dpi / 72 * min_height / region_height
+            matrix = fitz.Matrix(zoom, zoom)
+        pix = page.get_pixmap(
+            matrix=matrix, clip=clip, colorspace=fitz.csGRAY, alpha=False
+        )
+
+    region = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+    return region, (img_width, img_height), pixel_box
+
+
+def pdf_page_pixel_size(pdf_data: bytes, page_num: int, dpi: int = 150):
+    """
+    Pixel size of a PDF page rendered at dpi, without rasterizing it.
+
+    Returns:
+        (width, height) matching render_pdf_region()'s page size, or None if
+        the PDF has no such page
+    """
+    with _pdf_lock:
+        doc = open_pdf_cached(pdf_data)
+        if not 1 <= page_num <= doc.page_count:
+            return None
+        page_pixels = (
+            doc.load_page(page_num - 1).rect * fitz.Matrix(dpi / 72, dpi / 72)
+        ).irect
+        return page_pixels.width, page_pixels.height
+
+
+def pdf_page_count(pdf_data: bytes) -> int:
+    """Number of pages in a PDF."""
+    with _pdf_lock:
+        doc = open_pdf_cached(pdf_data)
+        return doc.page_count
+
+
+# Recently rendered PDF pages - the UI hits the same page repeatedly (batches,
+# bbox re-extraction, text detection), so each page is rasterized once.
+# Cached images are shared: callers must not modify them in place.
+RENDER_CACHE_MAX_ENTRIES = 8
+_render_cache = OrderedDict()
+_render_cache_lock = threading.Lock()
+
+
+def render_cache_key(
+    pdf_data: bytes,
+    page_num: int = 1,
+    dpi: int = 150,
+    max_height: int = None,
+    gray: bool = False,
+) -> tuple:
+    """Key of a page render in the render cache."""
+    return (document_page_key(pdf_data, page_num), dpi, max_height, gray)
+
+
+def render_is_cached(pdf_data: bytes, page_num: int = 1, dpi: int = 150) -> bool:
+    """Whether render_pdf_page_cached() already holds this full-colour page."""
+    with _render_cache_lock:
+        return render_cache_key(pdf_data, page_num, dpi) in _render_cache
+
+
+def render_pdf_page_cached(
+    pdf_data: bytes,
+    page_num: int = 1,
+    dpi: int = 150,
+    max_height: int = None,
+    gray: bool = False,
+):
+    """render_pdf_page() with an LRU cache keyed by document hash, page and size."""
+    cache_key = render_cache_key(pdf_data, page_num, dpi, max_height, gray)
+    with _render_cache_lock:
+        image = _render_cache.get(cache_key)
+        if image is not None:
+            _render_cache.move_to_end(cache_key)
+            logger.info(f"PDF page {page_num} render cache hit")
+            return image
+
+    image = render_pdf_page(pdf_data, page_num, dpi, max_height, gray)
+    if image is not None:
+        with _render_cache_lock:
+            _render_cache[cache_key] = image
+            while len(_render_cache) > RENDER_CACHE_MAX_ENTRIES:
+                _render_cache.popitem(last=False)
+    return image
+
+
+def load_document_image(
+    doc_data: bytes,
+    doc_format: str,
+    page_num: int = 1,
+    dpi: int = 150,
+    mode: Optional[str] = "RGB",
+    max_height: int = None,
+):
+    """
+    Decode an uploaded document (image or PDF page) into a PIL image.
+
+    Works entirely in memory - no temp files. PDF renders are cached, so the
+    returned image must not be modified in place.
+
+    Args:
+        mode: Image mode to convert uploaded images to. "L" decodes JPEGs
+              straight to grayscale; None skips the conversion so callers
+              that only OCR a crop can convert just that region to "L" (JPEGs
+              are still decoded as grayscale). PDF pages are rendered as "L"
+              for mode "L" and as RGB otherwise.
+        max_height: Optional pixel height cap for PDF renders (see
+                    render_pdf_page); uploaded images are returned as-is
+
+    Returns:
+        PIL Image, or None if a PDF has no such page
+    """
+    if doc_format == "pdf":
+        return render_pdf_page_cached(
+            doc_data, page_num, dpi, max_height, gray=mode == "L"
+        )
+
+    image = Image.open(io.BytesIO(doc_data))
+    if mode in (None, "L") and image.format == "JPEG":
+        image.draft("L", image.size)  # Decoder skips the YCbCr->RGB conversion
+    if mode is None:
+        return image
+    return image.convert(mode)
+
+
+# Hugging Face model answering the invoice questions
+LAYOUTLM_MODEL_ID = "impira/layoutlm-invoices"
+
+# INT8 dynamic quantization of the LayoutLM weights on CPU (QUANTIZE_MODEL=0
+# keeps FP32)
+QUANTIZE_MODEL = os.environ.get("QUANTIZE_MODEL", "1") == "1"
+
+# Intra-op threads per process for LayoutLM. Defaults to an even share of the
+# cores across gunicorn workers so they don't oversubscribe each other.
+TORCH_NUM_THREADS = int(os.environ.get("TORCH_NUM_THREADS", 0)) or max(
+    1, (os.cpu_count() or 1) // max(1, int(os.environ.get("WEB_CONCURRENCY", 1)))
+)
+
+
+# Serializes model loading - the background warmup and the first requests of a
+# worker may all ask for the model while it is still loading
+_model_load_lock = threading.Lock()
+
+
 def load_layoutlm_model():
-    """Load Impira LayoutLM model on first request (lazy loading)."""
+    """
+    Load Impira LayoutLM model (at worker startup, or on first request if preload is off).
+
+    Runs in the serving process itself (each gunicorn worker, never the
+    master), so the thread count, CUDA placement and INT8 quantization below
+    are per worker.
+    """
     global _doc_qa_pipeline
 
-    if _doc_qa_pipeline is None:
+    if _doc_qa_pipeline is not None:
+        return _doc_qa_pipeline
+
+    with _model_load_lock:
+        if _doc_qa_pipeline is not None:
+            return _doc_qa_pipeline
         logger.info(
             "Loading Impira LayoutLM invoice model (this may take 30-60 seconds)..."
         )
         try:
+            torch.set_num_threads(TORCH_NUM_THREADS)
+
+            # Run on the GPU in FP16 when one is available; CPU stays FP32
+            use_cuda = torch.cuda.is_available()
+
             # Use Impira's pre-trained LayoutLM model for invoice Q&A
             # This model is specifically fine-tuned on invoices
-            _doc_qa_pipeline = pipeline(
-                "document-question-answering", model="impira/layoutlm-invoices"
+            doc_qa = pipeline(
+                "document-question-answering",
+                model=LAYOUTLM_MODEL_ID,
+                device=0 if use_cuda else -1,
+                torch_dtype=torch.float16 if use_cuda else torch.float32,
             )
+            logger.info(
+                f"LayoutLM running on {'CUDA (FP16)' if use_cuda else 'CPU (FP32)'}"
+            )
+            doc_qa.model.eval()
+
+            # INT8 dynamic quantization of the Linear layers on CPU - uses VNNI
+            # int8 matmuls on CPUs that have them, 4x smaller weights. GPU keeps
+            # FP16 (quantized Linear layers have no CUDA kernels). Set
+            # QUANTIZE_MODEL=0 to keep the FP32 weights.
+            if not use_cuda and QUANTIZE_MODEL:
+                doc_qa.model = torch.quantization.quantize_dynamic(
+                    doc_qa.model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+                logger.info("✓ LayoutLM quantized to INT8 (dynamic)")
+
+            # Published only once fully set up - callers outside the lock
+            # must never see the unquantized model
+            _doc_qa_pipeline = doc_qa
             logger.info("✓ Impira LayoutLM invoice model loaded successfully")
         except Exception as e:
             logger.error(f"Failed to load LayoutLM model: {e}")
@@ -136,6 +669,62 @@ def load_layoutlm_model():
     return _doc_qa_pipeline
 
 
+# Set once this process has loaded the model and run a warmup inference
+_model_ready = threading.Event()
+_warmup_started = False
+_warmup_lock = threading.Lock()
+
+
+def warmup_model():
+    """
+    Load the model and run one dummy Q&A so the first real request doesn't
+    pay for lazy kernel/tokenizer initialization.
+    """
+    doc_qa = load_layoutlm_model()
+    with torch.inference_mode():
+        doc_qa(
+            image=Image.new("RGB", (224, 224), (255, 255, 255)),
+            question="What is the invoice number?",
+            word_boxes=[("warmup", [0, 0, 100, 100])],
+        )
+    _model_ready.set()
+    logger.info("✓ LayoutLM warmup inference complete")
+
+
+def start_background_warmup():
+    """
+    Run warmup_model() on a daemon thread, at most once per process.
+
+    /readyz reports 503 until it finishes. A failed warmup can be retried
+    by the next readiness probe.
+    """
+    global _warmup_started
+
+    with _warmup_lock:
+        if _warmup_started or _model_ready.is_set():
+            return
+        _warmup_started = True
+
+    def run():
+        global _warmup_started
+        try:
+            warmup_model()
+        except Exception as e:
+            logger.error(f"Background warmup failed: {e}", exc_info=True)
+            with _warmup_lock:
+                _warmup_started = False
+
+    threading.Thread(target=run, name="model-warmup", daemon=True).start()
+
+
+# Load and warm the model when a server process starts rather than on the
+# first request (set PRELOAD_MODEL=0 to load lazily). Under gunicorn this is
+# started in each worker by post_worker_init in gunicorn_conf.py - never in
+# the master before the fork: CUDA contexts and OpenMP thread pools created
+# before a fork are unusable in the child.
+PRELOAD_MODEL = os.environ.get("PRELOAD_MODEL", "1") == "1"
+
+
 def load_layoutlm_processor_and_model():
     """
     Load LayoutLM processor and model directly for bbox extraction.
@@ -148,11 +737,9 @@ def load_layoutlm_processor_and_model():
             "Loading LayoutLM processor and model for native bbox extraction..."
         )
         try:
-            _layoutlm_processor = LayoutLMv2Processor.from_pretrained(
-                "impira/layoutlm-invoices"
-            )
+            _layoutlm_processor = LayoutLMv2Processor.from_pretrained(LAYOUTLM_MODEL_ID)
             _layoutlm_model = LayoutLMv2ForQuestionAnswering.from_pretrained(
-                "impira/layoutlm-invoices"
+                LAYOUTLM_MODEL_ID
             )
             logger.info("✓ LayoutLM processor and model loaded successfully")
         except Exception as e:
@@ -162,43 +749,380 @@ def load_layoutlm_processor_and_model():
     return _layoutlm_processor, _layoutlm_model
 
 
-def perform_ocr_get_words(image_path: str) -> list:
+def parse_tesseract_config(config: str):
     """
-    Run Tesseract OCR to extract words with bounding boxes and confidences.
+    Map a "--psm N --oem M" config string to tesserocr (psm, oem) settings.
 
-    Returns:
-        List of dicts: [{'text': 'word', 'bbox': [x,y,w,h], 'confidence': 0-100}, ...]
+    Returns None if the config has any other options - those are only
+    supported through the tesseract CLI.
+    """
+    options = dict(re.findall(r"--(psm|oem)\s+(\d+)", config))
+    if re.sub(r"--(psm|oem)\s+\d+", "", config).strip():
+        return None
+    return int(options.get("psm", PSM.AUTO)), int(options.get("oem", OEM.DEFAULT))
+
+
+@contextmanager
+def tesseract_engine(psm: int, oem: int):
+    """
+    Check out a pooled tesserocr engine for (psm, oem), creating one if none
+    is idle. Blocks while TESSERACT_MAX_ENGINES engines are checked out.
+    """
+    with _tess_engine_slots:
+        with _tess_pools_lock:
+            pool = _tess_pools.setdefault((psm, oem), [])
+            api = pool.pop() if pool else None
+        if api is None:
+            api = PyTessBaseAPI(psm=psm, oem=oem)
+        try:
+            yield api
+        finally:
+            with _tess_pools_lock:
+                idle = sum(len(engines) for engines in _tess_pools.values())
+                if idle < TESSERACT_MAX_ENGINES:
+                    pool.append(api)
+                    api = None
+            if api is not None:
+                api.End()  # Pools are full (e.g. of other psm/oem settings)
+
+
+def tesserocr_word_columns(image: Image.Image, psm: int, oem: int):
     """
+    Run word-level OCR in-process through a pooled tesserocr engine.
+
+    Skips the tesseract subprocess spawn, the temp PNG encode and the TSV
+    round-trip of pytesseract. Returns the same columns as
+    tesseract_word_columns().
+    """
+    texts, confs, bboxes = [], [], []
+    with tesseract_engine(psm, oem) as api:
+        api.SetImage(image)
+        api.Recognize()
+        ri = api.GetIterator()
+        if ri is not None:
+            for word in iterate_level(ri, RIL.WORD):
+                text = (word.GetUTF8Text(RIL.WORD) or "").strip()
+                bbox = word.BoundingBox(RIL.WORD)
+                if text and bbox is not None:
+                    texts.append(text)
+                    confs.append(word.Confidence(RIL.WORD))
+                    bboxes.append(bbox)  # [x1, y1, x2, y2]
+
+    return (
+        texts,
+        np.asarray(confs, dtype=np.float64),
+        np.asarray(bboxes, dtype=np.int32).reshape(-1, 4),
+    )
+
+
+def pytesseract_image_to_data(image: Image.Image, config: str = "") -> str:
+    """
+    pytesseract.image_to_data() with the input PNG written to ocr_temp_dir().
+
+    Falls back to pytesseract's own temp file (in the default temp dir) when
+    /dev/shm has no room, or for images with alpha, which pytesseract
+    flattens onto white itself.
+    """
+    temp_dir = ocr_temp_dir()
+    if temp_dir is None or "A" in image.getbands():
+        return pytesseract.image_to_data(image, config=config)
+
+    input_path = None
     try:
-        image = Image.open(image_path).convert("RGB")
+        with tempfile.NamedTemporaryFile(
+            dir=temp_dir, prefix="tess_", suffix=".png", delete=False
+        ) as f:
+            input_path = f.name
+            image.save(f, format="PNG")
+    except OSError as e:  # /dev/shm filled up in the meantime
+        logger.warning(f"Could not write OCR input to {temp_dir}: {e}")
+        if input_path is not None:
+            with suppress(OSError):
+                os.unlink(input_path)
+        return pytesseract.image_to_data(image, config=config)
 
-        # Run Tesseract with detailed data
-        ocr_data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+    try:
+        return pytesseract.image_to_data(input_path, config=config)
+    finally:
+        os.unlink(input_path)
 
-        words = []
-        n_boxes = len(ocr_data["text"])
-        for i in range(n_boxes):
-            text = ocr_data["text"][i].strip()
-            conf = int(ocr_data["conf"][i])
 
-            # Skip empty or low confidence
-            if not text or conf < 0:
-                continue
+def tesseract_word_columns(image: Image.Image, config: str = ""):
+    """
+    Run Tesseract and return word-level results as aligned columns.
 
-            x = ocr_data["left"][i]
-            y = ocr_data["top"][i]
-            w = ocr_data["width"][i]
-            h = ocr_data["height"][i]
+    Uses the in-process tesserocr engine when available. Otherwise parses
+    the image_to_data TSV in bulk with NumPy instead of materializing
+    Output.DICT and converting each cell with int() in a Python loop. Only
+    word-level rows with non-empty text are kept.
 
-            words.append(
-                {
-                    "text": text,
-                    "bbox": [x, y, x + w, y + h],  # [x1, y1, x2, y2]
-                    "confidence": conf / 100.0,  # normalize to 0-1
-                }
+    Returns:
+        (texts, confs, bboxes): list of words, float array of 0-100 confidences
+        (-1 when unknown) and int32 array of [x1, y1, x2, y2] rows
+    """
+    if _use_tesserocr:
+        settings = parse_tesseract_config(config)
+        if settings is not None:
+            return tesserocr_word_columns(image, *settings)
+
+    tsv = pytesseract_image_to_data(image, config)
+    # level, page, block, par, line, word, left, top, width, height, conf, text
+    # Only word-level (5) rows carry text - page/block/par/line rows are
+    # dropped before they are split or copied into the array
+    rows = [
+        cols
+        for row in tsv.splitlines()
+        if row.startswith("5\t") and len(cols := row.split("\t", 11)) == 12
+    ]
+    if not rows:
+        return [], np.empty(0), np.empty((0, 4), dtype=np.int32)
+
+    table = np.array(rows)
+    texts = np.char.strip(table[:, 11])
+    keep = texts != ""
+    table = table[keep]
+
+    bboxes = table[:, 6:10].astype(np.int32)
+    bboxes[:, 2:] += bboxes[:, :2]  # width/height -> x2/y2
+    return texts[keep].tolist(), table[:, 10].astype(np.float64), bboxes
+
+
+# Horizontal strips OCR'd in parallel for full-page text detection
+OCR_STRIPS = min(4, os.cpu_count() or 1)
+
+# Pages of a multi-page document OCR'd at the same time
+OCR_CONCURRENCY = int(os.environ.get("OCR_CONCURRENCY", os.cpu_count() or 1))
+
+# Recent OCR results keyed by the OCR'd pixels, so repeat text detections on
+# the same page (e.g. with different exclude_bboxes) and repeat bbox
+# re-extractions skip Tesseract. Entries are word lists, so they stay small.
+OCR_REGION_CACHE_MAX_ENTRIES = 1024
+_ocr_region_cache = OrderedDict()
+_ocr_region_cache_lock = threading.Lock()
+
+
+def cached_tesseract_word_columns(image: Image.Image, config: str = ""):
+    """
+    tesseract_word_columns() memoized on a hash of the image pixels and config.
+
+    Returns fresh copies of the cached arrays, so callers may modify them.
+    """
+    digest = hashlib.blake2b(image.tobytes(), digest_size=16)
+    digest.update(f"{image.mode}:{image.size}:{config}".encode())
+    key = digest.hexdigest()
+
+    with _ocr_region_cache_lock:
+        entry = _ocr_region_cache.get(key)
+        if entry is not None:
+            _ocr_region_cache.move_to_end(key)
+    if entry is None:
+        entry = tesseract_word_columns(image, config)
+        with _ocr_region_cache_lock:
+            _ocr_region_cache[key] = entry
+            while len(_ocr_region_cache) > OCR_REGION_CACHE_MAX_ENTRIES:
+                _ocr_region_cache.popitem(last=False)
+
+    texts, confs, bboxes = entry
+    return list(texts), confs.copy(), bboxes.copy()
+
+
+def tesseract_word_columns_in_strips(
+    image: Image.Image, config: str = "", n_strips: int = OCR_STRIPS, overlap=0.05
+):
+    """
+    Run tesseract_word_columns() on horizontal strips of a page in parallel.
+
+    Each Tesseract call runs a separate single-threaded engine (a CLI process
+    or a pooled tesserocr engine), so strips scale across cores. Strips
+    overlap by `overlap` of the page height so a line on a strip boundary is
+    seen whole by at least one strip; each word is kept only by the strip
+    whose core band contains its vertical center. Strip results are cached,
+    so unchanged strips of a repeated page are not OCR'd again.
+
+    Returns:
+        Same (texts, confs, bboxes) columns as tesseract_word_columns(),
+        with bboxes in page coordinates
+    """
+    height = image.height
+    if n_strips <= 1:
+        return cached_tesseract_word_columns(image, config)
+
+    margin = int(height * overlap)
+    bands = []
+    for k in range(n_strips):
+        core_top = round(k * height / n_strips)
+        core_bottom = round((k + 1) * height / n_strips)
+        bands.append(
+            (
+                core_top,
+                core_bottom,
+                max(0, core_top - margin),
+                min(height, core_bottom + margin),
             )
+        )
+
+    def ocr_band(band):
+        core_top, core_bottom, top, bottom = band
+        texts, confs, bboxes = cached_tesseract_word_columns(
+            image.crop((0, top, image.width, bottom)), config
+        )
+        bboxes[:, 1::2] += top
+        centers = (bboxes[:, 1] + bboxes[:, 3]) / 2
+        keep = (centers >= core_top) & (centers < core_bottom)
+        return list(compress(texts, keep)), confs[keep], bboxes[keep]
+
+    with ThreadPoolExecutor(max_workers=n_strips) as executor:
+        results = list(executor.map(ocr_band, bands))
+
+    return (
+        [text for band_texts, _, _ in results for text in band_texts],
+        np.concatenate([confs for _, confs, _ in results]),
+        np.concatenate([bboxes for _, _, bboxes in results]),
+    )
+
+
+# Recent full-page OCR results keyed by document page, so later batches and
+# /reextract-bbox calls on the same page skip Tesseract
+OCR_CACHE_MAX_ENTRIES = 64
+_ocr_cache = OrderedDict()
+_ocr_cache_lock = threading.Lock()
+
+
+def document_page_key(doc_data: bytes, page_num: int = 1) -> str:
+    """Content hash identifying one page of an uploaded document."""
+    key = hashlib.blake2b(doc_data, digest_size=20)
+    key.update(f":{page_num}".encode())
+    return key.hexdigest()
+
+
+def get_cached_ocr(page_key: str) -> Dict[str, Any]:
+    """Return {'words', 'image_size'} for a cached page, or None."""
+    with _ocr_cache_lock:
+        entry = _ocr_cache.get(page_key)
+        if entry is not None:
+            _ocr_cache.move_to_end(page_key)
+        return entry
+
+
+def cache_ocr(page_key: str, words: list, image_size: tuple):
+    """Store a page's OCR words, evicting the least recently used page."""
+    with _ocr_cache_lock:
+        _ocr_cache[page_key] = {"words": words, "image_size": image_size}
+        _ocr_cache.move_to_end(page_key)
+        while len(_ocr_cache) > OCR_CACHE_MAX_ENTRIES:
+            _ocr_cache.popitem(last=False)
+
+
+def read_cached_region(page_key: str, bbox: list) -> Dict[str, Any]:
+    """
+    Read the text inside a normalized [0-1000] bbox from a page's cached OCR words.
+
+    Words count as inside when their center falls within the bbox.
+
+    Returns:
+        Dict with text, confidence, bbox_pixels and image_size, or None on a
+        cache miss or when no cached word lies inside the bbox
+    """
+    cached = get_cached_ocr(page_key)
+    if cached is None:
+        return None
+    return read_words_in_bbox(cached["words"], cached["image_size"], bbox)
+
+
+def read_words_in_bbox(ocr_words: list, image_size, bbox: list) -> Dict[str, Any]:
+    """
+    Read the text of the OCR words whose centers fall inside a normalized bbox.
+
+    Args:
+        ocr_words: perform_ocr_get_words() output for the page
+        image_size: (width, height) of the OCR'd page
+        bbox: [x1, y1, x2, y2] normalized to 0-1000
+
+    Returns:
+        Dict with text, confidence, bbox_pixels and image_size, or None when
+        no word lies inside the bbox
+    """
+    img_width, img_height = image_size
+    x1, y1, x2, y2 = bbox_to_pixels(bbox, img_width, img_height)
+
+    inside = [
+        w
+        for w in ocr_words
+        if x1 <= (w["bbox"][0] + w["bbox"][2]) / 2 <= x2
+        and y1 <= (w["bbox"][1] + w["bbox"][3]) / 2 <= y2
+    ]
+    if not inside:
+        return None
+
+    lines = group_words_into_lines(inside, img_height)
+    confidence = sum(w["confidence"] for w in inside) / len(inside)
+    return {
+        "text": " ".join(line["text"] for line in lines),
+        "confidence": round(confidence, 3),
+        "bbox_pixels": [x1, y1, x2, y2],
+        "image_size": {"width": img_width, "height": img_height},
+    }
+
+
+# Longest page edge fed to Tesseract - roughly 150dpi for A4/Letter, above which
+# OCR time grows with pixel count without improving accuracy. Override with the
+# OCR_MAX_EDGE env var (0 disables downscaling, e.g. for tiny print).
+OCR_MAX_EDGE = int(os.environ.get("OCR_MAX_EDGE", 1600))
+
+
+def perform_ocr_get_words(image: Image.Image, page_key: str = None) -> list:
+    """
+    Run Tesseract OCR to extract words with bounding boxes and confidences.
+
+    Large pages are downscaled to OCR_MAX_EDGE before OCR; bboxes are mapped
+    back to the original image's pixel coordinates.
+
+    Args:
+        image: RGB PIL Image of the page
+        page_key: Optional document_page_key() - reuses/stores cached OCR results
+
+    Returns:
+        List of dicts: [{'text': 'word', 'bbox': [x,y,w,h], 'confidence': 0-100}, ...]
+    """
+    try:
+        if page_key:
+            cached = get_cached_ocr(page_key)
+            if cached is not None and cached["image_size"] == image.size:
+                logger.info(f"OCR cache hit: {len(cached['words'])} words")
+                return cached["words"]
+        original_size = image.size
+
+        scale = 1.0
+        if OCR_MAX_EDGE and max(image.size) > OCR_MAX_EDGE:
+            scale = max(image.size) / OCR_MAX_EDGE
+            image = image.resize(
+                (round(image.width / scale), round(image.height / scale)),
+                Image.LANCZOS,
+            )
+            logger.info(f"Downscaled page to {image.width}x{image.height} for OCR")
+
+        # Run Tesseract with detailed data, skipping words without a confidence
+        texts, confs, bboxes = tesseract_word_columns(image)
+        keep = confs >= 0
+        bboxes = bboxes[keep]
+        if scale != 1.0:
+            bboxes = np.rint(bboxes * scale).astype(np.int64)
+        words = [
+            {
+                "text": text,
+                "bbox": bbox,  # [x1, y1, x2, y2]
+                "confidence": conf,  # normalized to 0-1
+            }
+            for text, bbox, conf in zip(
+                compress(texts, keep),
+                bboxes.tolist(),
+                (confs[keep] / 100.0).tolist(),
+            )
+        ]
 
         logger.info(f"OCR extracted {len(words)} words")
+        if page_key and words:
+            cache_ocr(page_key, words, original_size)
         if words:
             logger.info(f"Sample OCR word (first): {words[0]}")
             logger.info(f"Sample OCR word type: {type(words[0])}")
@@ -212,6 +1136,29 @@ def perform_ocr_get_words(image_path: str) -> list:
         return []
 
 
+def ocr_words_to_word_boxes(ocr_words: list, img_width: int, img_height: int) -> list:
+    """
+    Convert OCR words to the doc-QA pipeline's word_boxes format.
+
+    Passing word_boxes makes the pipeline skip its own Tesseract pass.
+
+    Returns:
+        List of tuples: [('word', [x1, y1, x2, y2]), ...] normalized to 0-1000
+    """
+    return [
+        (
+            w["text"],
+            [
+                int(1000 * w["bbox"][0] / img_width),
+                int(1000 * w["bbox"][1] / img_height),
+                int(1000 * w["bbox"][2] / img_width),
+                int(1000 * w["bbox"][3] / img_height),
+            ],
+        )
+        for w in ocr_words
+    ]
+
+
 def extract_answer_with_native_bbox(
     image: Image.Image, question: str, processor, model
 ) -> dict:
@@ -242,7 +1189,7 @@ def extract_answer_with_native_bbox(
         )
 
         # Run model to get answer span
-        with torch.no_grad():
+        with torch.inference_mode():
             outputs = model(**encoding)
 
         # Get start and end positions of answer
@@ -305,6 +1252,102 @@ def extract_answer_with_native_bbox(
         return {"answer": "", "bbox": [0, 0, 100, 100], "confidence": 0.0}
 
 
+# OCR fallback patterns per field, in priority order. Each has one capture group.
+_OCR_FIELD_PATTERNS = {
+    "invoice_number": [
+        r"(?:Invoice\s*(?:No\.?|Number|#)?[:\s]*)?([A-Z]{2,4}[-\s]?\d{4,})",  # TLS-2024-001
+        r"(?:INV[-\s]?)(\d{4,})",  # INV-12345
+        r"#\s*([A-Z0-9-]{5,})",  # #ABC-123
+    ],
+    "invoice_date": [
+        r"\b(\d{1,2}[-/\.]\d{1,2}[-/\.]\d{2,4})\b",  # 01/15/2024, 15-01-24
+        r"\b(\d{4}[-/\.]\d{1,2}[-/\.]\d{1,2})\b",  # 2024-01-15
+        r"\b(\d{1,2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{2,4})\b",  # 15 January 2024
+    ],
+    "total_amount": [
+        r"(?:Total|Amount\s+Due|Grand\s+Total|Invoice\s+Total)[:\s]*\$?\s*([\d,]+\.?\d{0,2})",
+        r"\$\s*([\d,]+\.\d{2})\s*(?:USD|EUR|GBP)?",  # $1,234.56 USD
+        r"(?:^|\s)(\d{1,3}(?:,\d{3})*\.\d{2})\s*(?:USD|EUR|GBP)",  # 1,234.56 USD
+    ],
+}
+_OCR_FIELD_PATTERN_LIST = [p for ps in _OCR_FIELD_PATTERNS.values() for p in ps]
+
+# One scan for all patterns: the leading lookahead only stops at positions where
+# some pattern matches, then each pattern is tried as an optional lookahead so
+# overlapping matches are all captured (a plain alternation would let one
+# pattern hide another that starts at the same place).
+_OCR_FIELD_REGEX = re.compile(
+    "(?=%s)" % "|".join(_OCR_FIELD_PATTERN_LIST)
+    + "".join(f"(?:(?={p}))?" for p in _OCR_FIELD_PATTERN_LIST),
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# With google-re2 each pattern is matched on its own DFA instead (RE2 has no
+# lookaheads, so the combined form above can't be used) - linear time even on
+# garbage OCR text
+_OCR_FIELD_RE2 = (
+    [re2.compile(f"(?im){p}") for p in _OCR_FIELD_PATTERN_LIST] if re2 else None
+)
+
+
+def find_first_pattern_matches(text: str) -> dict:
+    """
+    Find the first match of every OCR fallback pattern in a single pass over text.
+
+    Returns:
+        {field_label: [first group(1) value or None, ...]} in pattern priority order
+    """
+    count = len(_OCR_FIELD_PATTERN_LIST)
+    if _OCR_FIELD_RE2 is not None:
+        first = [
+            match.group(1) if (match := pattern.search(text)) else None
+            for pattern in _OCR_FIELD_RE2
+        ]
+    else:
+        first = [None] * count
+        remaining = count
+
+        for match in _OCR_FIELD_REGEX.finditer(text):
+            # Skip the gate's groups - the per-pattern groups follow them
+            for i, value in enumerate(match.groups()[count:]):
+                if value is not None and first[i] is None:
+                    first[i] = value
+                    remaining -= 1
+            if not remaining:
+                break
+
+    results = {}
+    start = 0
+    for label, patterns in _OCR_FIELD_PATTERNS.items():
+        results[label] = first[start : start + len(patterns)]
+        start += len(patterns)
+    return results
+
+
+def build_text_index(texts: list) -> dict:
+    """Map each text to the index of its first occurrence."""
+    index = {}
+    for i, text in enumerate(texts):
+        index.setdefault(text, i)
+    return index
+
+
+def find_overlapping_word(value: str, texts: list, index: dict = None):
+    """
+    Return the index of the first OCR text that contains or is contained in value.
+
+    Texts must already be normalized the same way as value (e.g. lowercased).
+    With a build_text_index() index, an exact hit bounds the substring scan
+    to the words before it. Returns None when no word overlaps.
+    """
+    exact = index.get(value) if index is not None else None
+    for i in range(len(texts) if exact is None else exact):
+        text = texts[i]
+        if value in text or text in value:
+            return i
+    return exact
+
+
 def extract_invoice_fields_ocr_only(ocr_words: list) -> list:
     """
     Extract invoice fields using OCR pattern matching (fallback when DocVQA fails).
@@ -339,116 +1382,379 @@ def extract_invoice_fields_ocr_only(ocr_words: list) -> list:
     full_text = " ".join([w["text"] for w in ocr_words])
     logger.info(f"Full OCR text sample (first 200 chars): {full_text[:200]}")
 
-    # Pattern 1: Invoice number (more flexible)
-    import re
+    # Normalize word texts once per document instead of once per lookup
+    lower_texts = [w["text"].lower() for w in ocr_words]
+    amount_texts = [w["text"].replace(",", "") for w in ocr_words]
+    lower_index = build_text_index(lower_texts)
+    amount_index = build_text_index(amount_texts)
 
-    inv_patterns = [
-        r"(?:Invoice\s*(?:No\.?|Number|#)?[:\s]*)?([A-Z]{2,4}[-\s]?\d{4,})",  # TLS-2024-001
-        r"(?:INV[-\s]?)(\d{4,})",  # INV-12345
-        r"#\s*([A-Z0-9-]{5,})",  # #ABC-123
-    ]
+    # Scan the text once for all field patterns
+    first_matches = find_first_pattern_matches(full_text)
 
-    for pattern in inv_patterns:
-        inv_match = re.search(pattern, full_text, re.IGNORECASE)
-        if inv_match:
-            inv_num = inv_match.group(1).strip()
+    # Pattern 1: Invoice number (more flexible)
+    for inv_num in first_matches["invoice_number"]:
+        if inv_num is not None:
+            inv_num = inv_num.strip()
             logger.info(f"Found invoice number: {inv_num}")
             # Find matching OCR word
-            for word in ocr_words:
-                if (
-                    inv_num.lower() in word["text"].lower()
-                    or word["text"].lower() in inv_num.lower()
-                ):
-                    fields.append(
-                        {
-                            "id": field_id,
-                            "label": "invoice_number",
-                            "value": inv_num,
-                            "bbox": word["bbox"],
-                            "confidence": word["confidence"],
-                            "source": "ocr_pattern",
-                        }
-                    )
-                    field_id += 1
-                    break
+            word_idx = find_overlapping_word(inv_num.lower(), lower_texts, lower_index)
+            if word_idx is not None:
+                word = ocr_words[word_idx]
+                fields.append(
+                    {
+                        "id": field_id,
+                        "label": "invoice_number",
+                        "value": inv_num,
+                        "bbox": word["bbox"],
+                        "confidence": word["confidence"],
+                        "source": "ocr_pattern",
+                    }
+                )
+                field_id += 1
             break  # Stop after first match
 
     # Pattern 2: Date (various formats) - improved
-    date_patterns = [
-        r"\b(\d{1,2}[-/\.]\d{1,2}[-/\.]\d{2,4})\b",  # 01/15/2024, 15-01-24
-        r"\b(\d{4}[-/\.]\d{1,2}[-/\.]\d{1,2})\b",  # 2024-01-15
-        r"\b(\d{1,2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{2,4})\b",  # 15 January 2024
+    for date_val in first_matches["invoice_date"]:
+        if date_val is None:
+            continue
+        logger.info(f"Found date: {date_val}")
+        date_parts = date_val.replace("-", " ").replace("/", " ").split()
+        for word in ocr_words:
+            # Match any part of the date
+            if any(part in word["text"] for part in date_parts):
+                fields.append(
+                    {
+                        "id": field_id,
+                        "label": "invoice_date",
+                        "value": date_val,
+                        "bbox": word["bbox"],
+                        "confidence": word["confidence"],
+                        "source": "ocr_pattern",
+                    }
+                )
+                field_id += 1
+                break
+        if any(f["label"] == "invoice_date" for f in fields):
+            break
+
+    # Pattern 3: Total amount - improved for commercial invoices
+    for total_val in first_matches["total_amount"]:
+        if total_val is not None:
+            amount = total_val.replace(",", "")
+            logger.info(f"Found total amount: ${amount}")
+            word_idx = find_overlapping_word(amount, amount_texts, amount_index)
+            if word_idx is not None:
+                word = ocr_words[word_idx]
+                fields.append(
+                    {
+                        "id": field_id,
+                        "label": "total_amount",
+                        "value": "$" + total_val,
+                        "bbox": word["bbox"],
+                        "confidence": word["confidence"],
+                        "source": "ocr_pattern",
+                    }
+                )
+                field_id += 1
+            break
+
+    logger.info(f"OCR pattern extraction found {len(fields)} fields")
+    return fields
+
+
+def merge_word_bboxes(words: list):
+    """
+    Merge the bboxes of a group of OCR words and average their confidences.
+
+    One pass carries all four extrema and the confidence sum - for the small
+    groups this sees (a line, a matched span) that beats building NumPy
+    arrays from the word dicts.
+
+    Returns:
+        ([x1, y1, x2, y2], avg_confidence)
+    """
+    x1, y1, x2, y2 = words[0]["bbox"]
+    conf_sum = 0.0
+    for w in words:
+        bx1, by1, bx2, by2 = w["bbox"]
+        if bx1 < x1:
+            x1 = bx1
+        if by1 < y1:
+            y1 = by1
+        if bx2 > x2:
+            x2 = bx2
+        if by2 > y2:
+            y2 = by2
+        conf_sum += w["confidence"]
+    return [x1, y1, x2, y2], conf_sum / len(words)
+
+
+def enhance_contrast(gray: Image.Image, factor: float) -> Image.Image:
+    """
+    Same result as ImageEnhance.Contrast(gray).enhance(factor) for "L" images.
+
+    Applies the blend around the mean grey level as a 256-entry lookup table
+    instead of building a full-size degenerate image and blending in floats.
+    """
+    hist = np.asarray(gray.histogram())
+    mean = int((hist * np.arange(256)).sum() / max(1, hist.sum()) + 0.5)
+    lut = np.clip(mean + factor * (np.arange(256) - mean), 0, 255).astype(np.uint8)
+    return gray.point(lut.tolist())
+
+
+def stretch_contrast(
+    gray: Image.Image, low: float = 2, high: float = 98
+) -> Image.Image:
+    """
+    Stretch the low..high percentile grey levels of an "L" image to 0..255.
+
+    Unlike a fixed contrast factor this adapts to each crop, so dark or
+    washed-out scans keep their detail instead of clipping. Percentiles come
+    from the histogram and the stretch is applied as a lookup table.
+    """
+    cdf = np.cumsum(gray.histogram())
+    if cdf[-1] == 0:
+        return gray
+    lo, hi = np.searchsorted(cdf, np.array([low, high]) / 100 * cdf[-1])
+    if hi <= lo:
+        return gray
+    lut = np.clip((np.arange(256) - lo) * 255 // (hi - lo), 0, 255).astype(np.uint8)
+    return gray.point(lut.tolist())
+
+
+# Binarize bbox crops with Otsu's threshold before OCR (set OCR_BINARIZE=1).
+# Off by default - Tesseract thresholds internally, and a global threshold
+# can drop faint text on uneven scans.
+OCR_BINARIZE = os.environ.get("OCR_BINARIZE", "0") == "1"
+
+
+def otsu_binarize(gray: Image.Image) -> Image.Image:
+    """
+    Threshold an "L" image to black/white at Otsu's level.
+
+    The threshold maximizes the between-class variance of the grey-level
+    histogram and is applied as a lookup table. Single-level images are
+    returned unchanged.
+    """
+    hist = np.asarray(gray.histogram(), dtype=np.float64)
+    weight = np.cumsum(hist)
+    total = weight[-1]
+    if total == 0:
+        return gray
+    mass = np.cumsum(hist * np.arange(256))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mass[-1] * weight - mass * total) ** 2 / (weight * (total - weight))
+    between = np.nan_to_num(between, nan=0.0, posinf=0.0)
+    if not between.any():
+        return gray
+    threshold = int(between.argmax())
+    lut = np.where(np.arange(256) > threshold, 255, 0).astype(np.uint8)
+    return gray.point(lut.tolist())
+
+
+# Straighten slightly rotated bbox crops before OCR (set OCR_DESKEW=1)
+OCR_DESKEW = os.environ.get("OCR_DESKEW", "0") == "1"
+
+
+def deskew(
+    gray: Image.Image, min_angle: float = 0.5, max_angle: float = 10.0
+) -> Image.Image:
+    """
+    Rotate an "L" crop so its text runs horizontally.
+
+    The skew is the principal axis of the dark (ink) pixels, which follows
+    the text lines of a field or table cell. Angles under min_angle are left
+    alone, and anything over max_angle is treated as a misestimate.
+
+    Returns:
+        Rotated copy (white fill, expanded to fit), or the input unchanged
+    """
+    ys, xs = np.nonzero(np.asarray(gray) < 128)
+    if xs.size < 50:
+        return gray
+    eigenvalues, eigenvectors = np.linalg.eigh(np.cov(xs, ys))
+    vx, vy = eigenvectors[:, eigenvalues.argmax()]
+    angle = float(np.degrees(np.arctan2(vy, vx)))
+    angle = (angle + 90) % 180 - 90  # Axis direction is sign-agnostic
+    if not min_angle <= abs(angle) <= max_angle:
+        return gray
+    return gray.rotate(
+        angle, resample=Image.Resampling.BILINEAR, expand=True, fillcolor=255
+    )
+
+
+def normalize_bboxes(bboxes, img_width: int, img_height: int):
+    """
+    Convert an (N, 4) array of pixel [x1, y1, x2, y2] bboxes to 0-1000 ints.
+
+    Same rounding as int((x / width) * 1000) per coordinate.
+    """
+    scale = np.array([img_width, img_height, img_width, img_height], dtype=np.float64)
+    return ((np.asarray(bboxes) / scale) * 1000).astype(np.int64)
+
+
+def best_sequence_match(query: str, choices: list, bounds=None):
+    """
+    Find the choice with the highest difflib SequenceMatcher ratio.
+
+    SequenceMatcher's matching blocks form a common subsequence, so the Indel
+    ratio (2 * LCS / total length) is an upper bound on its ratio. Given
+    those bounds, choices are scored best bound first and the scan stops once
+    no remaining choice can reach the best ratio found, so only a handful of
+    SequenceMatcher calls are made. Without bounds every choice is scored.
+
+    Returns:
+        (index, score 0-1) of the first best-scoring choice
+    """
+    if bounds is None:
+        scores = [SequenceMatcher(None, query, choice).ratio() for choice in choices]
+        index = max(range(len(scores)), key=scores.__getitem__)
+        return index, scores[index]
+
+    best_index, best_score = None, -1.0
+    for index in np.argsort(-bounds, kind="stable").tolist():
+        # Tolerance covers float rounding between the two 2*M/T computations
+        if bounds[index] + 1e-9 < best_score:
+            break
+        score = SequenceMatcher(None, query, choices[index]).ratio()
+        if score > best_score or (score == best_score and index < best_index):
+            best_index, best_score = index, score
+    return best_index, best_score
+
+
+def best_fuzzy_match(query: str, choices: list):
+    """
+    Find the choice most similar to query by difflib's SequenceMatcher ratio.
+
+    rapidfuzz's Indel ratio is not the same metric (it counts an optimal
+    LCS, SequenceMatcher greedy longest blocks), so it is only used, when
+    installed, to bound the ratios in one C++ call and skip most difflib
+    comparisons. Scores are identical with and without rapidfuzz, so the
+    callers' similarity thresholds mean the same thing either way.
+
+    Returns:
+        (index, score 0-1) of the first best-scoring choice, or (None, 0.0)
+        when there are no choices
+    """
+    if not choices:
+        return None, 0.0
+    bounds = None
+    if process is not None:
+        bounds = (
+            process.cdist(
+                [query], choices, scorer=fuzz.ratio, processor=None, dtype=np.float64
+            )[0]
+            / 100.0
+        )
+    return best_sequence_match(query, choices, bounds)
+
+
+def best_fuzzy_matches(queries: list, choices: list) -> list:
+    """
+    best_fuzzy_match() for many queries against the same choices.
+
+    With rapidfuzz the bounds for the whole queries x choices matrix are
+    computed in a single C++ call (process.cdist) instead of one per query.
+
+    Returns:
+        List of (index, score 0-1) tuples, one per query
+    """
+    if not choices or process is None:
+        return [best_fuzzy_match(query, choices) for query in queries]
+    if not queries:
+        return []
+    bounds = (
+        process.cdist(
+            queries, choices, scorer=fuzz.ratio, processor=None, dtype=np.float64
+        )
+        / 100.0
+    )
+    return [
+        best_sequence_match(query, choices, query_bounds)
+        for query, query_bounds in zip(queries, bounds)
     ]
 
-    for pattern in date_patterns:
-        for match in re.finditer(pattern, full_text, re.IGNORECASE):
-            date_val = match.group(1)
-            logger.info(f"Found date: {date_val}")
-            for word in ocr_words:
-                # Match any part of the date
-                if any(
-                    part in word["text"]
-                    for part in date_val.replace("-", " ").replace("/", " ").split()
-                ):
-                    fields.append(
-                        {
-                            "id": field_id,
-                            "label": "invoice_date",
-                            "value": date_val,
-                            "bbox": word["bbox"],
-                            "confidence": word["confidence"],
-                            "source": "ocr_pattern",
-                        }
-                    )
-                    field_id += 1
-                    break
-            break  # Only first date
-        if any(f["label"] == "invoice_date" for f in fields):
-            break
 
-    # Pattern 3: Total amount - improved for commercial invoices
-    total_patterns = [
-        r"(?:Total|Amount\s+Due|Grand\s+Total|Invoice\s+Total)[:\s]*\$?\s*([\d,]+\.?\d{0,2})",
-        r"\$\s*([\d,]+\.\d{2})\s*(?:USD|EUR|GBP)?",  # $1,234.56 USD
-        r"(?:^|\s)(\d{1,3}(?:,\d{3})*\.\d{2})\s*(?:USD|EUR|GBP)",  # 1,234.56 USD
-    ]
+# Longest run of OCR words scored as one candidate by the fuzzy bbox matcher
+MAX_SPAN_WORDS = 10
+
+
+def build_ocr_index(ocr_words: list) -> dict:
+    """
+    Build the value-independent lookups used by the match_value_to_ocr_bbox*
+    helpers. Build once per page and pass to every match.
+
+    The multi-word spans for fuzzy matching are only built on first use,
+    see ocr_index_spans().
+
+    Returns:
+        {
+            'texts': lowercased word texts,
+            'exact': lowercased text -> first OCR word with that text,
+            'combined_text': " ".join(texts),
+            'offsets': start of each word in combined_text (ascending)
+        }
+    """
+    texts = [w["text"].lower() for w in ocr_words]
+
+    exact = {}
+    for word, text in zip(ocr_words, texts):
+        exact.setdefault(text, word)
+
+    offsets = []
+    position = 0
+    for text in texts:
+        offsets.append(position)
+        position += len(text) + 1
 
-    for pattern in total_patterns:
-        total_match = re.search(pattern, full_text, re.IGNORECASE | re.MULTILINE)
-        if total_match:
-            amount = total_match.group(1).replace(",", "")
-            logger.info(f"Found total amount: ${amount}")
-            for word in ocr_words:
-                if (
-                    amount in word["text"].replace(",", "")
-                    or word["text"].replace(",", "") in amount
-                ):
-                    fields.append(
-                        {
-                            "id": field_id,
-                            "label": "total_amount",
-                            "value": "$" + total_match.group(1),
-                            "bbox": word["bbox"],
-                            "confidence": word["confidence"],
-                            "source": "ocr_pattern",
-                        }
-                    )
-                    field_id += 1
-                    break
-            break
+    return {
+        "texts": texts,
+        "exact": exact,
+        "combined_text": " ".join(texts),
+        "offsets": offsets,
+    }
 
-    logger.info(f"OCR pattern extraction found {len(fields)} fields")
-    return fields
+
+def ocr_index_spans(ocr_index: dict):
+    """
+    Candidate word spans of an OCR index, built on first use and kept on it.
+
+    Returns:
+        (spans, span_texts): (i, j) word ranges of 1 to MAX_SPAN_WORDS words
+        and the lowercased text of each span
+    """
+    if "spans" not in ocr_index:
+        texts = ocr_index["texts"]
+        spans = []
+        span_texts = []
+        for i in range(len(texts)):
+            # Extend each candidate string one word at a time
+            span_text = texts[i]
+            for j in range(i + 1, min(i + MAX_SPAN_WORDS + 1, len(texts) + 1)):
+                if j > i + 1:
+                    span_text += " " + texts[j - 1]
+                spans.append((i, j))
+                span_texts.append(span_text)
+        # One assignment, so a concurrent caller never sees half an entry
+        ocr_index["spans"] = (spans, span_texts)
+    return ocr_index["spans"]
 
 
 def match_value_to_ocr_bbox(
-    value: str, ocr_words: list, img_width: int, img_height: int
+    value: str,
+    ocr_words: list,
+    img_width: int,
+    img_height: int,
+    ocr_index: dict,
 ) -> dict:
     """
     Match extracted value to OCR words and return bbox + confidence.
 
     Uses fuzzy matching to find value in OCR text and return merged bbox.
 
+    Args:
+        ocr_index: build_ocr_index() of ocr_words, built once per page
+
     Returns:
         {'bbox': [x1, y1, x2, y2], 'confidence': float}
     """
@@ -458,60 +1764,50 @@ def match_value_to_ocr_bbox(
     value_lower = str(value).lower().strip()
 
     # Try exact match first
-    for word in ocr_words:
-        if word["text"].lower() == value_lower:
-            return {"bbox": word["bbox"], "confidence": word["confidence"]}
+    hit = ocr_index["exact"].get(value_lower)
+    if hit:
+        return {"bbox": hit["bbox"], "confidence": hit["confidence"]}
+
+    ocr_texts = ocr_index["texts"]
 
     # Try partial/substring match
     matching_words = []
-    for word in ocr_words:
-        if value_lower in word["text"].lower() or word["text"].lower() in value_lower:
+    for word, text in zip(ocr_words, ocr_texts):
+        if value_lower in text or text in value_lower:
             matching_words.append(word)
 
     if matching_words:
         # Merge bboxes of matching words
-        x1 = min(w["bbox"][0] for w in matching_words)
-        y1 = min(w["bbox"][1] for w in matching_words)
-        x2 = max(w["bbox"][2] for w in matching_words)
-        y2 = max(w["bbox"][3] for w in matching_words)
-        avg_conf = sum(w["confidence"] for w in matching_words) / len(matching_words)
+        merged_bbox, avg_conf = merge_word_bboxes(matching_words)
 
-        return {"bbox": [x1, y1, x2, y2], "confidence": avg_conf}
+        return {"bbox": merged_bbox, "confidence": avg_conf}
 
     # Try multi-word match (value contains multiple words)
     words_in_value = value_lower.split()
     if len(words_in_value) > 1:
-        # Find sequence of OCR words that matches
-        ocr_texts = [w["text"].lower() for w in ocr_words]
-        ocr_combined = " ".join(ocr_texts)
-
-        if value_lower in ocr_combined:
-            # Find word indices
-            start_idx = None
-            for i in range(len(ocr_words)):
-                candidate = " ".join(ocr_texts[i : i + len(words_in_value)])
-                if value_lower in candidate or candidate in value_lower:
-                    start_idx = i
-                    break
+        # Find sequence of OCR words that matches - locate the value in the
+        # joined page text, then map its offset back to the word it starts in
+        position = ocr_index["combined_text"].find(value_lower)
 
-            if start_idx is not None:
-                end_idx = min(start_idx + len(words_in_value), len(ocr_words))
-                matched = ocr_words[start_idx:end_idx]
+        if position >= 0:
+            start_idx = bisect_right(ocr_index["offsets"], position) - 1
+            end_idx = min(start_idx + len(words_in_value), len(ocr_words))
+            matched = ocr_words[start_idx:end_idx]
 
-                x1 = min(w["bbox"][0] for w in matched)
-                y1 = min(w["bbox"][1] for w in matched)
-                x2 = max(w["bbox"][2] for w in matched)
-                y2 = max(w["bbox"][3] for w in matched)
-                avg_conf = sum(w["confidence"] for w in matched) / len(matched)
+            merged_bbox, avg_conf = merge_word_bboxes(matched)
 
-                return {"bbox": [x1, y1, x2, y2], "confidence": avg_conf}
+            return {"bbox": merged_bbox, "confidence": avg_conf}
 
     # No match found - return default
     return {"bbox": [0, 0, 100, 100], "confidence": 0.3}
 
 
 def match_value_to_ocr_bbox_improved(
-    value: str, ocr_words: list, img_width: int, img_height: int
+    value: str,
+    ocr_words: list,
+    img_width: int,
+    img_height: int,
+    ocr_index: dict,
 ) -> dict:
     """
     IMPROVED bbox matching with fuzzy string matching for better accuracy.
@@ -520,6 +1816,9 @@ def match_value_to_ocr_bbox_improved(
     that match the extracted value, even if OCR and LayoutLM slightly disagree
     on word boundaries.
 
+    Args:
+        ocr_index: build_ocr_index() of ocr_words, built once per page
+
     Returns:
         {'bbox': [x1, y1, x2, y2], 'confidence': float}
     """
@@ -528,47 +1827,37 @@ def match_value_to_ocr_bbox_improved(
 
     value_clean = value.lower().strip()
     best_match = None
-    best_ratio = 0
 
     # Try exact match first (fastest)
-    for word in ocr_words:
-        if word["text"].lower() == value_clean:
-            return {"bbox": word["bbox"], "confidence": word["confidence"]}
+    hit = ocr_index["exact"].get(value_clean)
+    if hit:
+        return {"bbox": hit["bbox"], "confidence": hit["confidence"]}
 
     # Try to find contiguous sequence of OCR words that best matches the value
-    # This handles multi-word answers and slight OCR differences
-    for i in range(len(ocr_words)):
-        # Try sequences of 1 to 10 words starting at position i
-        for j in range(i + 1, min(i + 11, len(ocr_words) + 1)):
-            # Build candidate string from OCR words[i:j]
-            candidate_words = ocr_words[i:j]
-            candidate_text = " ".join(w["text"] for w in candidate_words).lower()
-
-            # Calculate similarity ratio using SequenceMatcher
-            ratio = SequenceMatcher(None, value_clean, candidate_text).ratio()
-
-            # Keep track of best match
-            if ratio > best_ratio:
-                best_ratio = ratio
-                best_match = candidate_words
+    # This handles multi-word answers and slight OCR differences. Candidate
+    # spans of 1 to MAX_SPAN_WORDS words are built once per page index.
+    ocr_texts = ocr_index["texts"]
+    spans, span_texts = ocr_index_spans(ocr_index)
+
+    # Score every candidate in one call and keep the best
+    best_index, best_ratio = best_fuzzy_match(value_clean, span_texts)
+    if best_index is not None:
+        i, j = spans[best_index]
+        best_match = ocr_words[i:j]
 
     # If we found a good match (>70% similarity), use it
     if best_match and best_ratio > 0.7:
         # Merge bboxes of all matched words
-        x1 = min(w["bbox"][0] for w in best_match)
-        y1 = min(w["bbox"][1] for w in best_match)
-        x2 = max(w["bbox"][2] for w in best_match)
-        y2 = max(w["bbox"][3] for w in best_match)
-        avg_conf = sum(w["confidence"] for w in best_match) / len(best_match)
+        merged_bbox, avg_conf = merge_word_bboxes(best_match)
 
         logger.debug(
             f"Matched '{value}' to OCR with {best_ratio:.2f} similarity: {' '.join(w['text'] for w in best_match)}"
         )
-        return {"bbox": [x1, y1, x2, y2], "confidence": avg_conf}
+        return {"bbox": merged_bbox, "confidence": avg_conf}
 
     # Fallback: try simple substring matching
-    for word in ocr_words:
-        if value_clean in word["text"].lower() or word["text"].lower() in value_clean:
+    for word, text in zip(ocr_words, ocr_texts):
+        if value_clean in text or text in value_clean:
             return {"bbox": word["bbox"], "confidence": word["confidence"]}
 
     # No match found
@@ -577,7 +1866,7 @@ def match_value_to_ocr_bbox_improved(
 
 
 def extract_table_rows_intelligent(
-    image_path: str,
+    image: Image.Image,
     line_item_fields: list,
     ocr_words: list,
     img_width: int,
@@ -595,7 +1884,7 @@ def extract_table_rows_intelligent(
     5. Returns structured row data with proper field associations
 
     Args:
-        image_path: Path to the invoice image
+        image: RGB PIL Image of the invoice page
         line_item_fields: List of field definitions for line items (field_key, question, category)
         ocr_words: Pre-extracted OCR words with bboxes
         img_width: Image width in pixels
@@ -610,56 +1899,56 @@ def extract_table_rows_intelligent(
             f"[TABLE DETECTION] Starting intelligent table extraction for {len(line_item_fields)} line item fields..."
         )
 
-        # Load image
-        image = Image.open(image_path).convert("RGB")
-
         # IMPROVED: Use same high-quality OCR as text selection
         # Apply contrast enhancement for better text detection
         image_gray = image.convert("L")
-        from PIL import ImageEnhance
-
-        enhancer = ImageEnhance.Contrast(image_gray)
-        image_enhanced = enhancer.enhance(1.3)
+        image_enhanced = enhance_contrast(image_gray, 1.3)
 
         # Run OCR with PSM 3 (automatic page segmentation) + OEM 1 (LSTM neural net)
         # This is much more accurate than PSM 6 for complex table layouts
         logger.info(
             "[TABLE DETECTION] Running high-quality OCR (PSM 3 + OEM 1) for table structure..."
         )
-        ocr_result = pytesseract.image_to_data(
-            image_enhanced,
-            output_type=pytesseract.Output.DICT,
-            config="--psm 3 --oem 1",
+        texts, confs, bboxes = tesseract_word_columns(
+            image_enhanced, config="--psm 3 --oem 1"
         )
 
-        # Build enhanced text blocks with better filtering
-        text_blocks = []
-        for i in range(len(ocr_result["text"])):
-            text = ocr_result["text"][i].strip()
-            conf = int(ocr_result["conf"][i])
-
-            if text and conf > 20:  # Lower threshold for better table detection
-                x, y = ocr_result["left"][i], ocr_result["top"][i]
-                w, h = ocr_result["width"][i], ocr_result["height"][i]
-
-                # Normalized bbox [0-1000]
-                norm_bbox = [
-                    int((x / img_width) * 1000),
-                    int((y / img_height) * 1000),
-                    int(((x + w) / img_width) * 1000),
-                    int(((y + h) / img_height) * 1000),
-                ]
-
-                text_blocks.append(
-                    {
-                        "text": text,
-                        "bbox": norm_bbox,
-                        "pixel_bbox": [x, y, x + w, y + h],
-                        "conf": conf,
-                        "center_x": int((x + w / 2) / img_width * 1000),
-                        "center_y": int((y + h / 2) / img_height * 1000),
-                    }
+        # Build enhanced text blocks with better filtering (confidences parsed
+        # and filtered as one array, whole-number like Output.DICT)
+        confs = confs.astype(np.int64)
+        keep = confs > 20  # Lower threshold for better table detection
+        bboxes = bboxes[keep]
+        confs = confs[keep]
+        centers = (bboxes[:, :2] + bboxes[:, 2:]) / 2 / [img_width, img_height] * 1000
+
+        # Blocks keep their row in the bboxes/confs arrays ("index"), so cell
+        # merges reduce array slices instead of looping over block dicts
+        text_blocks = [
+            {
+                "index": index,
+                "text": text,
+                "bbox": norm_bbox,  # Normalized bbox [0-1000]
+                "pixel_bbox": pixel_bbox,
+                "conf": conf,
+                "center_x": center_x,
+                "center_y": center_y,
+            }
+            for index, (
+                text,
+                norm_bbox,
+                pixel_bbox,
+                conf,
+                (center_x, center_y),
+            ) in enumerate(
+                zip(
+                    compress(texts, keep),
+                    normalize_bboxes(bboxes, img_width, img_height).tolist(),
+                    bboxes.tolist(),
+                    confs.tolist(),
+                    centers.astype(np.int64).tolist(),
                 )
+            )
+        ]
 
         logger.info(f"[TABLE DETECTION] OCR found {len(text_blocks)} text blocks")
 
@@ -670,12 +1959,6 @@ def extract_table_rows_intelligent(
             return []
 
         # Step 1: Find potential table headers by matching field names
-        from difflib import SequenceMatcher
-
-        def fuzzy_match_score(a, b):
-            """Calculate similarity between two strings (0-1)"""
-            return SequenceMatcher(None, a.lower(), b.lower()).ratio()
-
         # Build field name variants for matching
         field_headers = {}
         for field in line_item_fields:
@@ -794,18 +2077,32 @@ def extract_table_rows_intelligent(
             f"[TABLE DETECTION] Sample headers: {[b['text'] for b in potential_header_blocks[:10]]}"
         )
 
-        # Match headers to field names with stricter scoring
+        # Match headers to field names with stricter scoring - every block is
+        # scored against every variant of every field in one call
+        variant_keys = [
+            field_key
+            for field_key, header_info in field_headers.items()
+            for _ in header_info["variants"]
+        ]
+        variant_texts = [
+            variant.lower()
+            for header_info in field_headers.values()
+            for variant in header_info["variants"]
+        ]
+
+        block_matches = best_fuzzy_matches(
+            [block["text"].lower() for block in potential_header_blocks],
+            variant_texts,
+        )
+
         detected_headers = {}
-        for block in potential_header_blocks:
+        for block, (variant_index, best_score) in zip(
+            potential_header_blocks, block_matches
+        ):
             best_match = None
-            best_score = 0.5  # Increased minimum threshold from 0.4 to 0.5
-
-            for field_key, header_info in field_headers.items():
-                for variant in header_info["variants"]:
-                    score = fuzzy_match_score(block["text"], variant)
-                    if score > best_score:
-                        best_score = score
-                        best_match = field_key
+            # Increased minimum threshold from 0.4 to 0.5
+            if best_score > 0.5:
+                best_match = variant_keys[variant_index]
 
             if best_match:
                 # Avoid duplicate matches - only keep best match for each field
@@ -1031,18 +2328,14 @@ def extract_table_rows_intelligent(
                     merged_text = " ".join([b[1]["text"] for b in matching_blocks])
 
                     # Expand bbox to include all matching blocks
-                    all_bboxes = [b[1]["pixel_bbox"] for b in matching_blocks]
-                    merged_bbox = [
-                        min(bbox[0] for bbox in all_bboxes),  # x1
-                        min(bbox[1] for bbox in all_bboxes),  # y1
-                        max(bbox[2] for bbox in all_bboxes),  # x2
-                        max(bbox[3] for bbox in all_bboxes),  # y2
-                    ]
+                    indices = [b[1]["index"] for b in matching_blocks]
+                    cell_bboxes = bboxes[indices]
+                    merged_bbox = np.concatenate(
+                        (cell_bboxes[:, :2].min(axis=0), cell_bboxes[:, 2:].max(axis=0))
+                    ).tolist()
 
                     # Average confidence
-                    avg_conf = sum(b[1]["conf"] for b in matching_blocks) / len(
-                        matching_blocks
-                    )
+                    avg_conf = float(confs[indices].mean())
 
                     row_data["fields"][field_key] = {
                         "value": merged_text.strip(),
@@ -1080,11 +2373,44 @@ def extract_table_rows_intelligent(
         return []
 
 
+# Answer invoice_number / invoice_date / total_amount from the OCR regex
+# patterns instead of asking LayoutLM (set OCR_PATTERN_SHORTCUT=1).
+# Off by default - the patterns are unanchored heuristics that can match the
+# wrong text, so LayoutLM stays the primary extractor.
+OCR_PATTERN_SHORTCUT = os.environ.get("OCR_PATTERN_SHORTCUT", "0") == "1"
+
+# OCR word confidence above which an OCR-pattern match replaces the LayoutLM
+# question for that field
+PATTERN_FIELD_MIN_CONFIDENCE = 0.75
+
+
+def pattern_value_key(text: str) -> str:
+    """Normalize an OCR word or pattern value for exact comparison."""
+    return text.lower().replace(",", "").strip(" $:#")
+
+
+def is_exact_pattern_match(pattern_field: dict, ocr_words: list) -> bool:
+    """
+    Check that an OCR-pattern field's bbox word is the whole value.
+
+    extract_invoice_fields_ocr_only() takes the first word that merely
+    contains (or is contained in) the value, so a short word can stand in for
+    a longer match. Only a word equal to the value is trusted as the answer.
+    """
+    value = pattern_value_key(pattern_field["value"])
+    return any(
+        word["bbox"] == pattern_field["bbox"]
+        and pattern_value_key(word["text"]) == value
+        for word in ocr_words
+    )
+
+
 def extract_invoice_fields_layoutlm(
-    image_path: str,
+    image: Image.Image,
     custom_fields: list = None,
     start_field_id: int = 1,
     template_hints: dict = None,
+    page_key: str = None,
 ) -> List[dict]:
     """
     Extract invoice fields using Impira's LayoutLM document Q&A model.
@@ -1093,12 +2419,13 @@ def extract_invoice_fields_layoutlm(
     approach to extract fields. Much better than generic LayoutLMv3!
 
     Args:
-        image_path: Path to the invoice image
+        image: RGB PIL Image of the invoice page
         custom_fields: Optional list of custom field definitions from user
                       Each field should have: key, question, type, required
         start_field_id: Starting ID for field numbering (for batch processing)
         template_hints: Optional template hints from few-shot learning system
                        Contains field_hints with bbox, typical_value, and confidence
+        page_key: Optional document_page_key() for reusing cached OCR words
 
     Returns:
         List of extracted fields with bboxes and confidence scores
@@ -1107,14 +2434,20 @@ def extract_invoice_fields_layoutlm(
         # Load model (pipeline for impira/layoutlm-invoices)
         doc_qa = load_layoutlm_model()
 
-        # Open image
-        image = Image.open(image_path).convert("RGB")
         img_width, img_height = image.size
 
         # Get OCR words with bboxes for matching
         logger.info("Running OCR to get word bboxes...")
-        ocr_words = perform_ocr_get_words(image_path)
+        ocr_words = perform_ocr_get_words(image, page_key)
         logger.info(f"OCR found {len(ocr_words)} words")
+        ocr_index = build_ocr_index(ocr_words)
+
+        # Reuse these words for Q&A so the pipeline doesn't re-run OCR per question
+        qa_kwargs = {}
+        if ocr_words:
+            qa_kwargs["word_boxes"] = ocr_words_to_word_boxes(
+                ocr_words, img_width, img_height
+            )
 
         # Build template hints lookup for quick access
         template_hint_map = {}
@@ -1195,6 +2528,42 @@ def extract_invoice_fields_layoutlm(
         fields = []
         field_id = start_field_id
 
+        # Cheap matcher first (OCR_PATTERN_SHORTCUT): standard fields the OCR
+        # patterns found as a whole, confidently read word don't need a
+        # LayoutLM question
+        pattern_fields = (
+            extract_invoice_fields_ocr_only(ocr_words) if OCR_PATTERN_SHORTCUT else []
+        )
+        for pattern_field in pattern_fields:
+            label = pattern_field["label"]
+            field_config = questions.get(label)
+            if (
+                field_config is None
+                or pattern_field["confidence"] <= PATTERN_FIELD_MIN_CONFIDENCE
+                or not is_exact_pattern_match(pattern_field, ocr_words)
+                or (
+                    isinstance(field_config, dict)
+                    and field_config.get("category") == "line_items"
+                )
+            ):
+                continue
+
+            del questions[label]
+            fields.append(
+                {
+                    **pattern_field,
+                    "id": field_id,
+                    "field_name": label,
+                    "confidence": float(pattern_field["confidence"]),
+                    "is_line_item": False,
+                    "row_index": None,
+                }
+            )
+            field_id += 1
+            logger.info(
+                f"✓ {label}: {pattern_field['value']} (OCR pattern, skipping Q&A)"
+            )
+
         logger.info(
             f"Extracting fields using LayoutLM Q&A for {len(questions)} questions..."
         )
@@ -1224,7 +2593,7 @@ def extract_invoice_fields_layoutlm(
 
             # Extract table rows using intelligent detection
             table_rows = extract_table_rows_intelligent(
-                image_path=image_path,
+                image=image,
                 line_item_fields=line_item_field_defs,
                 ocr_words=ocr_words,
                 img_width=img_width,
@@ -1270,6 +2639,46 @@ def extract_invoice_fields_layoutlm(
                     "[TABLE MODE] Table extraction returned no rows - falling back to naive Q&A"
                 )
 
+        # Group Q&A for the remaining fields by top_k - each group is one batched
+        # pipeline call, so the questions share padded forward passes
+        pending = {}
+        for field_label, field_config in questions.items():
+            if not isinstance(field_config, dict):
+                pending.setdefault(None, []).append((field_label, field_config))
+            elif field_config.get("category", "") != "line_items":
+                pending.setdefault(None, []).append(
+                    (field_label, field_config["question"])
+                )
+            elif not table_rows_extracted:
+                pending.setdefault(5, []).append(
+                    (field_label, field_config["question"])
+                )
+
+        def ask_batch(group, top_k):
+            inputs = [
+                {"image": image, "question": question, **qa_kwargs}
+                for _, question in group
+            ]
+            top_k_kwargs = {"top_k": top_k} if top_k else {}
+            try:
+                with torch.inference_mode():
+                    answers = doc_qa(inputs, batch_size=len(inputs), **top_k_kwargs)
+            except Exception as e:
+                logger.warning(f"Batched Q&A failed ({e}) - asking one at a time")
+                answers = []
+                for (field_label, _), qa_input in zip(group, inputs):
+                    try:
+                        with torch.inference_mode():
+                            answers.append(doc_qa(**qa_input, **top_k_kwargs))
+                    except Exception as e:
+                        logger.warning(f"Failed to extract {field_label}: {e}")
+                        answers.append(None)
+            return dict(zip((field_label for field_label, _ in group), answers))
+
+        qa_results = {}
+        for top_k, group in pending.items():
+            qa_results.update(ask_batch(group, top_k))
+
         # Process remaining fields (non-line-items or if table extraction failed)
         for field_label, field_config in questions.items():
             try:
@@ -1297,10 +2706,10 @@ def extract_invoice_fields_layoutlm(
                     logger.info(
                         f"[FALLBACK Q&A] Extracting {field_label} using top_k=5..."
                     )
-                    result = doc_qa(image=image, question=question, top_k=5)
+                    result = qa_results.get(field_label)
                 else:
                     # Regular field - single answer
-                    result = doc_qa(image=image, question=question)
+                    result = qa_results.get(field_label)
 
                 # Result format: [{'score': 0.95, 'answer': 'INV-12345', 'start': 10, 'end': 10}]
                 if result:
@@ -1332,7 +2741,7 @@ def extract_invoice_fields_layoutlm(
 
                             # IMPROVED: Match the answer text to OCR words to get bbox
                             bbox_match = match_value_to_ocr_bbox_improved(
-                                answer, ocr_words, img_width, img_height
+                                answer, ocr_words, img_width, img_height, ocr_index
                             )
                             bbox = bbox_match.get("bbox", [0, 0, img_width // 4, 30])
 
@@ -1427,35 +2836,21 @@ def group_words_into_lines(ocr_words: list, image_height: int) -> list:
     if not ocr_words:
         return []
 
+    n_words = len(ocr_words)
+    xs = np.fromiter((w["bbox"][0] for w in ocr_words), dtype=np.int32, count=n_words)
+    ys = np.fromiter((w["bbox"][1] for w in ocr_words), dtype=np.int32, count=n_words)
+
     # Sort words by Y position (top to bottom), then X (left to right)
-    sorted_words = sorted(ocr_words, key=lambda w: (w["bbox"][1], w["bbox"][0]))
+    order = np.lexsort((xs, ys))
 
-    lines = []
-    current_line = []
+    # A new line starts wherever Y1 jumps by at least the threshold from the previous word
     line_threshold = max(10, image_height * 0.01)  # 1% of image height or 10px
+    breaks = np.flatnonzero(np.diff(ys[order]) >= line_threshold) + 1
 
-    for word in sorted_words:
-        if not current_line:
-            current_line.append(word)
-        else:
-            # Check if word is on same line (similar Y coordinate)
-            prev_y = current_line[-1]["bbox"][1]  # Y1 of previous word
-            curr_y = word["bbox"][1]
-
-            if abs(curr_y - prev_y) < line_threshold:
-                # Same line
-                current_line.append(word)
-            else:
-                # New line - save current and start new
-                if current_line:
-                    lines.append(merge_line_words(current_line))
-                current_line = [word]
-
-    # Add last line
-    if current_line:
-        lines.append(merge_line_words(current_line))
-
-    return lines
+    return [
+        merge_line_words([ocr_words[i] for i in line])
+        for line in np.split(order, breaks)
+    ]
 
 
 def merge_line_words(words: list) -> dict:
@@ -1466,37 +2861,85 @@ def merge_line_words(words: list) -> dict:
     # Combine text
     text = " ".join([w["text"] for w in words])
 
-    # Merge bboxes
-    x1 = min(w["bbox"][0] for w in words)
-    y1 = min(w["bbox"][1] for w in words)
-    x2 = max(w["bbox"][2] for w in words)
-    y2 = max(w["bbox"][3] for w in words)
-
-    # Average confidence
-    avg_conf = sum(w["confidence"] for w in words) / len(words)
+    # Merge bboxes and average confidence
+    merged_bbox, avg_conf = merge_word_bboxes(words)
 
     return {
         "text": text,
-        "bbox": [x1, y1, x2, y2],
+        "bbox": merged_bbox,
         "confidence": avg_conf,
         "word_count": len(words),
     }
 
 
+# Every field of a saved vendor template must be read at least this
+# confidently for the template to answer without LayoutLM
+TEMPLATE_MIN_CONFIDENCE = 0.8
+
+
+def extract_fields_from_template(
+    ocr_words: list, image_size, template: dict, start_field_id: int = 1
+) -> Optional[List[dict]]:
+    """
+    Read a saved vendor template's fields straight from the page's OCR words.
+
+    Each template field's bbox is read with read_words_in_bbox(). The
+    template only counts as a match when every field has text there with
+    at least TEMPLATE_MIN_CONFIDENCE.
+
+    Returns:
+        List of extracted fields (same keys as the LayoutLM fields, with the
+        template field's line-item metadata), or None when the template
+        doesn't match
+    """
+    template_fields = [f for f in template.get("fields", []) if f.get("bbox")]
+    if not template_fields:
+        return None
+
+    fields = []
+    for field_id, template_field in enumerate(template_fields, start=start_field_id):
+        label = template_field.get("field_name") or f"field_{field_id}"
+        region = read_words_in_bbox(ocr_words, image_size, template_field["bbox"])
+        if region is None or region["confidence"] < TEMPLATE_MIN_CONFIDENCE:
+            logger.info(f"[Template] No confident text for '{label}' - not a match")
+            return None
+
+        is_line_item = bool(template_field.get("is_line_item"))
+        fields.append(
+            {
+                "id": field_id,
+                "label": label,
+                "field_name": label,
+                "value": region["text"],
+                "bbox": template_field["bbox"],
+                "confidence": region["confidence"],
+                "source": "template",
+                "is_line_item": is_line_item,
+                "row_index": template_field.get("row_index") if is_line_item else None,
+            }
+        )
+    return fields
+
+
 def extract_fields_with_donut(
-    image_path: str,
+    image: Image.Image,
     custom_fields: list = None,
     start_field_id: int = 1,
     template_hints: dict = None,
+    page_key: str = None,
+    template: dict = None,
 ) -> Dict[str, Any]:
     """
     Extract invoice fields using Impira LayoutLM Document Q&A model.
 
     Args:
-        image_path: Path to image file
+        image: RGB PIL Image of the document page
         custom_fields: List of field definitions with questions
         start_field_id: Starting ID for fields
         template_hints: Optional template hints for few-shot learning with bbox suggestions
+        page_key: Optional document_page_key() for reusing cached OCR words
+        template: Optional saved vendor template (load_template()) - when all
+                  its fields read confidently from OCR, LayoutLM is skipped
 
     New Strategy (LayoutLM Q&A):
     - Use pre-trained invoice model that handles OCR internally
@@ -1505,7 +2948,7 @@ def extract_fields_with_donut(
     - Much simpler and more accurate than previous OCR+token-classification approach
 
     Args:
-        image_path: Path to image file
+        image: RGB PIL Image of the document page
         custom_fields: Optional list of custom field definitions from user
         start_field_id: Starting ID for field numbering (for batch processing)
 
@@ -1513,16 +2956,37 @@ def extract_fields_with_donut(
         Dictionary with extracted fields and bounding boxes
     """
     try:
-        # Load image
-        image = Image.open(image_path).convert("RGB")
         image_width, image_height = image.size
 
         logger.info(f"Image loaded: {image_width}x{image_height}")
 
+        if template:
+            # OCR words are cached under page_key, so a template miss doesn't
+            # re-run OCR for LayoutLM below
+            template_fields = extract_fields_from_template(
+                perform_ocr_get_words(image, page_key),
+                image.size,
+                template,
+                start_field_id,
+            )
+            if template_fields:
+                logger.info(
+                    f"[Template] '{template.get('vendor_name')}' matched {len(template_fields)} fields - skipping LayoutLM"
+                )
+                return {
+                    "raw_output": {
+                        "mode": "template",
+                        "template": template.get("vendor_name"),
+                        "template_version": template.get("version"),
+                    },
+                    "fields": template_fields,
+                    "image_size": {"width": image_width, "height": image_height},
+                }
+
         # Extract invoice fields using LayoutLM Q&A
         # Pass custom fields if provided and starting field ID
         layoutlm_fields = extract_invoice_fields_layoutlm(
-            image_path, custom_fields, start_field_id, template_hints
+            image, custom_fields, start_field_id, template_hints, page_key
         )
         logger.info(f"LayoutLM Q&A extracted {len(layoutlm_fields)} invoice fields")
 
@@ -1548,7 +3012,7 @@ def extract_fields_with_donut(
         return {
             "raw_output": {
                 "mode": "layoutlm_qa",
-                "model": "impira/layoutlm-invoices",
+                "model": LAYOUTLM_MODEL_ID,
                 "ai_fields": len(layoutlm_fields),
                 "custom_fields_used": custom_fields is not None,
             },
@@ -1561,6 +3025,97 @@ def extract_fields_with_donut(
         raise
 
 
+# Most PDF pages one /extract request may ask for. Kept within
+# OCR_CACHE_MAX_ENTRIES so the pages OCR'd by a request are all still cached
+# for follow-up /reextract-bbox calls.
+MAX_PDF_PAGES = min(int(os.environ.get("MAX_PDF_PAGES", 32)), OCR_CACHE_MAX_ENTRIES)
+
+
+def select_pdf_pages(pages, page_count: int) -> Optional[List[int]]:
+    """
+    Resolve the "pages" option of /extract to a list of page numbers.
+
+    Args:
+        pages: "all" or a list of 1-based page numbers
+        page_count: Number of pages in the PDF
+
+    Returns:
+        Page numbers in request order without duplicates, or None if pages is
+        neither "all" nor a list of integers between 1 and page_count
+    """
+    if pages == "all":
+        return list(range(1, page_count + 1))
+    if not isinstance(pages, list) or not all(
+        type(p) is int and 1 <= p <= page_count for p in pages
+    ):
+        return None
+    return list(dict.fromkeys(pages))
+
+
+def extract_pdf_pages(
+    pdf_data: bytes, page_nums: List[int], custom_fields: list = None
+) -> Dict[str, Any]:
+    """
+    Run extract_fields_with_donut() over several pages of a PDF.
+
+    Pages are rendered and OCR'd concurrently (OCR_CONCURRENCY at a time) to
+    warm the OCR cache while LayoutLM runs page by page on the cached words.
+    Only the pages in flight are held in memory - each page image is released
+    once its fields are extracted.
+
+    Args:
+        pdf_data: Raw PDF bytes
+        page_nums: 1-based page numbers from select_pdf_pages()
+        custom_fields: Optional list of custom field definitions
+
+    Returns:
+        Combined result whose fields carry their "page" number
+    """
+
+    def prepare_page(page_num):
+        image = load_document_image(pdf_data, "pdf", page_num)
+        page_key = document_page_key(pdf_data, page_num)
+        perform_ocr_get_words(image, page_key)
+        return image, page_key
+
+    fields = []
+    page_sizes = []
+    raw_output = image_size = None
+    workers = max(1, min(len(page_nums), OCR_CONCURRENCY))
+    logger.info(f"OCR'ing {len(page_nums)} PDF pages, {workers} at a time")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        queued = iter(page_nums)
+        in_flight = deque(
+            (page_num, executor.submit(prepare_page, page_num))
+            for page_num in islice(queued, workers)
+        )
+        while in_flight:
+            page_num, future = in_flight.popleft()
+            image, page_key = future.result()
+            next_page = next(queued, None)
+            if next_page is not None:
+                in_flight.append((next_page, executor.submit(prepare_page, next_page)))
+
+            next_id = max((f["id"] for f in fields), default=0) + 1
+            result = extract_fields_with_donut(
+                image, custom_fields, next_id, page_key=page_key
+            )
+            del image
+            for field in result["fields"]:
+                field["page"] = page_num
+            fields.extend(result["fields"])
+            page_sizes.append({"page": page_num, **result["image_size"]})
+            raw_output = raw_output or result["raw_output"]
+            image_size = image_size or result["image_size"]
+
+    return {
+        "raw_output": {**raw_output, "ai_fields": len(fields), "pages": page_nums},
+        "fields": fields,
+        "image_size": image_size,
+        "pages": page_sizes,
+    }
+
+
 def convert_donut_to_standard_format(
     donut_result: Dict, img_width: int, img_height: int
 ) -> list:
@@ -1688,13 +3243,10 @@ def match_field_to_ocr(
     # Lowercase for matching
     target = value.lower()
 
-    best = None
-    best_score = 0.0
-    for e in ocr_entries:
-        score = SequenceMatcher(None, target, e["text"].lower()).ratio()
-        if score > best_score:
-            best_score = score
-            best = e
+    best_index, best_score = best_fuzzy_match(
+        target, [e["text"].lower() for e in ocr_entries]
+    )
+    best = ocr_entries[best_index]
 
     # If best score is reasonable, use its bbox; otherwise keep existing
     if best and best_score > 0.45:
@@ -1739,6 +3291,32 @@ def health_check():
     )
 
 
+@app.route("/readyz", methods=["GET"])
+def readiness_check():
+    """
+    Readiness probe - 503 until this worker has loaded and warmed the model.
+
+    Also starts the warmup if nothing has yet (lazy PRELOAD_MODEL=0 setups
+    or WSGI servers other than gunicorn).
+    """
+    if _model_ready.is_set():
+        return jsonify({"status": "ready"})
+
+    start_background_warmup()
+    return jsonify({"status": "warming_up"}), 503
+
+
+@app.route("/warmup", methods=["POST"])
+def warmup():
+    """Load the model (if needed) and run a dummy inference."""
+    try:
+        warmup_model()
+        return jsonify({"status": "success", "model_loaded": True})
+    except Exception as e:
+        logger.error(f"Warmup failed: {e}", exc_info=True)
+        return jsonify({"status": "error", "error": str(e)}), 500
+
+
 @app.route("/extract", methods=["POST"])
 def extract_document():
     """
@@ -1756,15 +3334,20 @@ def extract_document():
                     "required": true
                 },
                 ...
-            ]
+            ],
+            "pages": "all" | [1, 2, ...],  // Optional, PDF only (default: first
+                                           // page), at most MAX_PDF_PAGES pages
+            "vendor_name": "acme_corp"  // Optional, single page only - answer
+                                        // from the saved template when it matches
         }
 
     Returns:
         {
             "status": "success",
-            "fields": [...],
+            "fields": [...],  // Each tagged with its "page" when pages is set
             "raw_output": {...},
-            "image_size": {...}
+            "image_size": {...},
+            "pages": [{"page": 1, "width": ..., "height": ...}, ...]  // When pages is set
         }
     """
     try:
@@ -1778,9 +3361,33 @@ def extract_document():
             return jsonify({"error": "Missing image data"}), 400
 
         # Decode base64 document
-        doc_data = base64.b64decode(data["image"])
+        doc_data = decode_document_data(data["image"])
         doc_format = data.get("format", "png").lower()
         custom_fields = data.get("custom_fields")  # Optional custom field definitions
+        pages = data.get("pages") if doc_format == "pdf" else None
+        if pages:
+            page_count = pdf_page_count(doc_data)
+            page_nums = select_pdf_pages(pages, page_count)
+            if page_nums is None:
+                return (
+                    jsonify(
+                        {
+                            "error": f'pages must be "all" or a list of page numbers from 1 to {page_count}'
+                        }
+                    ),
+                    400,
+                )
+            if len(page_nums) > MAX_PDF_PAGES:
+                return (
+                    jsonify(
+                        {
+                            "error": f"At most {MAX_PDF_PAGES} pages can be extracted per request ({len(page_nums)} requested)"
+                        }
+                    ),
+                    400,
+                )
+        vendor_name = sanitize_vendor_name(data.get("vendor_name") or "")
+        template = load_template(vendor_name) if vendor_name and not pages else None
 
         logger.info(f"[/extract] custom_fields parameter: {custom_fields}")
         if custom_fields:
@@ -1791,43 +3398,44 @@ def extract_document():
         else:
             logger.info("[/extract] No custom_fields in request")
 
-        # Save to temp file
-        with tempfile.NamedTemporaryFile(suffix=f".{doc_format}", delete=False) as tmp:
-            tmp.write(doc_data)
-            tmp_path = tmp.name
-
-        try:
-            # Convert PDF to image if needed
+        cache_key = result_cache_key(
+            doc_data, doc_format, custom_fields, pages, template
+        )
+        cached = load_cached_result(cache_key)
+        if cached is not None:
+            logger.info(f"[/extract] Returning cached result {cache_key[:12]}")
+            return jsonify(cached)
+
+        if pages:
+            # Multi-page PDF - pages are OCR'd concurrently
+            result = extract_pdf_pages(doc_data, page_nums, custom_fields)
+        else:
+            # Decode the document in memory (first page for PDFs)
             if doc_format == "pdf":
                 logger.info(f"Converting PDF to image ({len(doc_data)} bytes)")
-                images = convert_from_path(tmp_path, first_page=1, last_page=1, dpi=200)
-
-                if not images:
-                    return jsonify({"error": "PDF has no pages"}), 400
+            image = load_document_image(doc_data, doc_format)
 
-                # Save first page as PNG
-                img_path = tmp_path.replace(".pdf", ".png")
-                images[0].save(img_path, "PNG")
+            if image is None:
+                return jsonify({"error": "PDF has no pages"}), 400
 
-                # Delete PDF, use image
-                os.unlink(tmp_path)
-                tmp_path = img_path
-                logger.info(
-                    f"PDF converted to {images[0].width}x{images[0].height} PNG"
-                )
+            if doc_format == "pdf":
+                logger.info(f"PDF converted to {image.width}x{image.height} image")
 
             # Extract fields (with optional custom field definitions)
-            result = extract_fields_with_donut(tmp_path, custom_fields)
+            result = extract_fields_with_donut(
+                image,
+                custom_fields,
+                page_key=document_page_key(doc_data),
+                template=template,
+            )
 
-            logger.info(f"Returning {len(result.get('fields', []))} fields to client")
-            if result.get("fields"):
-                logger.info(f"Sample field: {result['fields'][0]}")
+        logger.info(f"Returning {len(result.get('fields', []))} fields to client")
+        if result.get("fields"):
+            logger.info(f"Sample field: {result['fields'][0]}")
+            # Only cache real results - an empty list may be a transient failure
+            save_cached_result(cache_key, {"status": "success", **result})
 
-            return jsonify({"status": "success", **result})
-        finally:
-            # Cleanup
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
+        return jsonify({"status": "success", **result})
 
     except Exception as e:
         logger.error(f"Extraction error: {e}", exc_info=True)
@@ -1878,7 +3486,7 @@ def extract_document_batch():
             return jsonify({"error": "Missing image data"}), 400
 
         # Extract parameters
-        doc_data = base64.b64decode(data["image"])
+        doc_data = decode_document_data(data["image"])
         doc_format = data.get("format", "png").lower()
         custom_fields = data.get("custom_fields", [])
         batch_size = data.get("batch_size", 5)
@@ -1931,60 +3539,45 @@ def extract_document_batch():
                 }
             )
 
-        # Save to temp file
-        with tempfile.NamedTemporaryFile(suffix=f".{doc_format}", delete=False) as tmp:
-            tmp.write(doc_data)
-            tmp_path = tmp.name
-
-        try:
-            # Convert PDF to image if needed
-            if doc_format == "pdf":
-                images = convert_from_path(tmp_path, first_page=1, last_page=1, dpi=200)
-                if not images:
-                    return jsonify({"error": "PDF has no pages"}), 400
-
-                img_path = tmp_path.replace(".pdf", ".png")
-                images[0].save(img_path, "PNG")
-                os.unlink(tmp_path)
-                tmp_path = img_path
+        # Decode the document in memory (first page for PDFs)
+        image = load_document_image(doc_data, doc_format)
+        if image is None:
+            return jsonify({"error": "PDF has no pages"}), 400
 
-            # Extract ONLY the batch fields
-            # Calculate starting field ID based on batch index
-            start_field_id = (batch_index * batch_size) + 1
+        # Extract ONLY the batch fields
+        # Calculate starting field ID based on batch index
+        start_field_id = (batch_index * batch_size) + 1
 
-            logger.info(f"[/extract-batch] Starting field IDs from {start_field_id}")
+        logger.info(f"[/extract-batch] Starting field IDs from {start_field_id}")
 
-            result = extract_fields_with_donut(
-                tmp_path,
-                batch_fields,
-                start_field_id,
-                template_hints=template_hints,  # Pass template hints for few-shot learning
-            )
-
-            logger.info(
-                f"[/extract-batch] Extracted {len(result.get('fields', []))} fields from batch {batch_index}"
-            )
+        result = extract_fields_with_donut(
+            image,
+            batch_fields,
+            start_field_id,
+            template_hints=template_hints,  # Pass template hints for few-shot learning
+            page_key=document_page_key(doc_data),  # Later batches reuse the OCR
+        )
 
-            return jsonify(
-                {
-                    "status": "success",
-                    "fields": result.get("fields", []),
-                    "batch_info": {
-                        "batch_index": batch_index,
-                        "batch_size": batch_size,
-                        "total_fields": len(sorted_fields),
-                        "total_batches": total_batches,
-                        "has_more": has_more,
-                        "processed_count": len(result.get("fields", [])),
-                        "next_batch_index": batch_index + 1 if has_more else None,
-                    },
-                    "image_size": result.get("image_size", {}),
-                }
-            )
+        logger.info(
+            f"[/extract-batch] Extracted {len(result.get('fields', []))} fields from batch {batch_index}"
+        )
 
-        finally:
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
+        return jsonify(
+            {
+                "status": "success",
+                "fields": result.get("fields", []),
+                "batch_info": {
+                    "batch_index": batch_index,
+                    "batch_size": batch_size,
+                    "total_fields": len(sorted_fields),
+                    "total_batches": total_batches,
+                    "has_more": has_more,
+                    "processed_count": len(result.get("fields", [])),
+                    "next_batch_index": batch_index + 1 if has_more else None,
+                },
+                "image_size": result.get("image_size", {}),
+            }
+        )
 
     except Exception as e:
         logger.error(f"Batch extraction error: {e}", exc_info=True)
@@ -2039,118 +3632,124 @@ def reextract_bbox():
         logger.info(f"Re-extracting text from bbox: {bbox} on page {page_num}")
 
         # Decode base64 image
-        image_data = base64.b64decode(image_b64)
-
-        # Save to temp file
-        with tempfile.NamedTemporaryFile(
-            suffix=f".{file_format}", delete=False
-        ) as tmp_file:
-            tmp_file.write(image_data)
-            tmp_path = tmp_file.name
-
-        try:
-            # Convert PDF to image if needed
-            if file_format == "pdf":
-                logger.info(f"Converting PDF page {page_num} to image...")
-                images = convert_from_path(
-                    tmp_path, first_page=page_num, last_page=page_num
-                )
-                if not images:
-                    return (
-                        jsonify({"status": "error", "error": "Failed to convert PDF"}),
-                        500,
-                    )
-
-                # Save the page as image
-                page_image_path = tmp_path.replace(".pdf", ".png")
-                images[0].save(page_image_path, "PNG")
-                image_path = page_image_path
-            else:
-                image_path = tmp_path
-
-            # Open image to get dimensions
-            image = Image.open(image_path).convert("RGB")
-            img_width, img_height = image.size
-
-            # Convert normalized bbox [0-1000] to pixel coordinates
-            x1 = int((bbox[0] / 1000.0) * img_width)
-            y1 = int((bbox[1] / 1000.0) * img_height)
-            x2 = int((bbox[2] / 1000.0) * img_width)
-            y2 = int((bbox[3] / 1000.0) * img_height)
-
-            # Ensure coordinates are valid
-            x1, x2 = max(0, min(x1, img_width)), max(0, min(x2, img_width))
-            y1, y2 = max(0, min(y1, img_height)), max(0, min(y2, img_height))
-
-            # Crop image to bbox
-            cropped_image = image.crop((x1, y1, x2, y2))
+        image_data = decode_document_data(image_b64)
 
+        # Answer from the page's cached OCR words if /extract already read it
+        cached_region = read_cached_region(
+            document_page_key(image_data, page_num), bbox
+        )
+        if cached_region:
             logger.info(
-                f"Cropped region: ({x1}, {y1}) to ({x2}, {y2}), size: {cropped_image.size}"
-            )
-
-            # Preprocess image for better OCR accuracy
-            # 1. Convert to grayscale
-            cropped_gray = cropped_image.convert("L")
-
-            # 2. Increase contrast and brightness
-            from PIL import ImageEnhance
-
-            enhancer = ImageEnhance.Contrast(cropped_gray)
-            cropped_enhanced = enhancer.enhance(2.0)  # Increase contrast
-
-            # 3. Upscale small images (Tesseract works better on larger images)
-            min_height = 50
-            if cropped_enhanced.size[1] < min_height:
-                scale_factor = min_height / cropped_enhanced.size[1]
-                new_size = (
-                    int(cropped_enhanced.size[0] * scale_factor),
-                    int(cropped_enhanced.size[1] * scale_factor),
-                )
-                cropped_enhanced = cropped_enhanced.resize(
-                    new_size, Image.Resampling.LANCZOS
-                )
-                logger.info(f"Upscaled image to: {new_size}")
-
-            # Run OCR on preprocessed image with optimized config
-            # --psm 6: Treat image as a uniform block of text (handles multiline better)
-            # --oem 3: Use LSTM OCR Engine
-            ocr_config = "--psm 6 --oem 3"
-            ocr_result = pytesseract.image_to_string(
-                cropped_enhanced, config=ocr_config
+                f"Extracted text from OCR cache: '{cached_region['text']}' (confidence: {cached_region['confidence']:.2f})"
             )
-            # Join multiple lines with space (for multiline cells in tables)
-            extracted_text = " ".join(ocr_result.strip().split("\n"))
-
-            # Get confidence from enhanced image
-            ocr_data = pytesseract.image_to_data(
-                cropped_enhanced, output_type=pytesseract.Output.DICT, config=ocr_config
+            return jsonify({"status": "success", **cached_region})
+
+        # 150dpi is plenty for one bbox's text and matches /extract, so the
+        # page render is usually already cached. Otherwise only the bbox
+        # region of the PDF page is rasterized (below), so just its size is
+        # looked up here.
+        image = None
+        if file_format == "pdf" and not render_is_cached(image_data, page_num, 150):
+            page_size = pdf_page_pixel_size(image_data, page_num, 150)
+        else:
+            image = load_document_image(
+                image_data, file_format, page_num, dpi=150, mode=None
             )
-            confidences = [int(c) for c in ocr_data["conf"] if int(c) > 0]
-            avg_confidence = (
-                sum(confidences) / len(confidences) / 100.0 if confidences else 0.0
+            page_size = image.size if image is not None else None
+        if page_size is None:
+            return (
+                jsonify({"status": "error", "error": "Failed to convert PDF"}),
+                500,
             )
 
-            logger.info(
-                f"Extracted text: '{extracted_text}' (confidence: {avg_confidence:.2f})"
-            )
+        img_width, img_height = page_size
+        x1, y1, x2, y2 = bbox_to_pixels(bbox, img_width, img_height)
 
+        # A bbox collapsed to a line (or clamped off the page) has no text -
+        # skip rendering, preprocessing and Tesseract
+        if x2 <= x1 or y2 <= y1:
+            logger.info(f"Empty bbox region ({x1}, {y1}) to ({x2}, {y2}), skipping OCR")
             return jsonify(
                 {
                     "status": "success",
-                    "text": extracted_text,
-                    "confidence": round(avg_confidence, 3),
+                    "text": "",
+                    "confidence": 0.0,
                     "bbox_pixels": [x1, y1, x2, y2],
                     "image_size": {"width": img_width, "height": img_height},
                 }
             )
 
-        finally:
-            # Cleanup temp files
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
-            if file_format == "pdf" and os.path.exists(image_path):
-                os.unlink(image_path)
+        if image is None:
+            # Zoomed to the 50px OCR minimum height so it needs no upscaling below
+            logger.info(f"Rendering bbox region of PDF page {page_num}...")
+            cropped_gray, _, _ = render_pdf_region(
+                image_data, page_num, bbox, dpi=150, min_height=50
+            )
+        else:
+            # Crop image to bbox - only this region gets converted to grayscale
+            cropped_gray = image.crop((x1, y1, x2, y2)).convert("L")
+            # crop() copies the region - drop the page so it isn't held through
+            # OCR (cached PDF renders stay alive in the render cache)
+            del image
+
+        logger.info(
+            f"Cropped region: ({x1}, {y1}) to ({x2}, {y2}), size: {cropped_gray.size}"
+        )
+
+        # Preprocess image for better OCR accuracy
+        # 1. Stretch contrast to the crop's own grey range
+        cropped_enhanced = stretch_contrast(cropped_gray)
+
+        # Optionally straighten skewed scans - only the text is returned here,
+        # so rotating the crop doesn't affect any coordinates
+        if OCR_DESKEW:
+            cropped_enhanced = deskew(cropped_enhanced)
+
+        # 2. Upscale small images (Tesseract works better on larger images)
+        #    Bilinear is enough for these small crops and much cheaper than Lanczos
+        min_height = 50
+        if cropped_enhanced.size[1] < min_height:
+            scale_factor = min_height / cropped_enhanced.size[1]
+            new_size = (
+                int(cropped_enhanced.size[0] * scale_factor),
+                int(cropped_enhanced.size[1] * scale_factor),
+            )
+            cropped_enhanced = cropped_enhanced.resize(
+                new_size, Image.Resampling.BILINEAR
+            )
+            logger.info(f"Upscaled image to: {new_size}")
+
+        # 3. Optionally binarize (after upscaling, so edges are smooth)
+        if OCR_BINARIZE:
+            cropped_enhanced = otsu_binarize(cropped_enhanced)
+
+        # Run OCR on preprocessed image with optimized config
+        # --psm 6: Treat image as a uniform block of text (handles multiline better)
+        # --oem 3: Use LSTM OCR Engine
+        # Single Tesseract pass - text and confidence both come from the word data
+        ocr_config = "--psm 6 --oem 3"
+        texts, confs, _ = cached_tesseract_word_columns(
+            cropped_enhanced, config=ocr_config
+        )
+        # Join words (and lines, for multiline cells in tables) with spaces
+        extracted_text = " ".join(texts)
+
+        confidences = confs[confs > 0]
+        avg_confidence = float(confidences.mean()) / 100.0 if confidences.size else 0.0
+
+        logger.info(
+            f"Extracted text: '{extracted_text}' (confidence: {avg_confidence:.2f})"
+        )
+
+        return jsonify(
+            {
+                "status": "success",
+                "text": extracted_text,
+                "confidence": round(avg_confidence, 3),
+                "bbox_pixels": [x1, y1, x2, y2],
+                "image_size": {"width": img_width, "height": img_height},
+            }
+        )
 
     except Exception as e:
         logger.error(f"Error in reextract_bbox: {e}", exc_info=True)
@@ -2192,125 +3791,84 @@ def extract_batch():
             return jsonify({"error": "Missing required parameters"}), 400
 
         # Decode base64 document
-        doc_data = base64.b64decode(data["image"])
+        doc_data = decode_document_data(data["image"])
         doc_format = data.get("format", "png").lower()
         bbox = data["bbox"]  # [x1, y1, x2, y2] in normalized [0-1000] coordinates
         field_name = data["field_name"]
 
-        # Save to temp file
-        with tempfile.NamedTemporaryFile(suffix=f".{doc_format}", delete=False) as tmp:
-            tmp.write(doc_data)
-            tmp_path = tmp.name
-
-        try:
-            # Convert PDF to image if needed
-            image_path = tmp_path
-            if doc_format == "pdf":
-                logger.info(f"Converting PDF to image for batch extraction")
-                images = convert_from_path(tmp_path, first_page=1, last_page=1, dpi=200)
-
-                if not images:
-                    return jsonify({"error": "PDF has no pages"}), 400
+        # Decode the page in memory
+        if doc_format == "pdf":
+            logger.info(f"Converting PDF to image for batch extraction")
+        image = load_document_image(doc_data, doc_format, dpi=200, mode=None)
+        if image is None:
+            return jsonify({"error": "PDF has no pages"}), 400
 
-                page_image_path = tmp_path.replace(".pdf", ".png")
-                images[0].save(page_image_path, "PNG")
-                image_path = page_image_path
-
-            # Open image to get dimensions
-            image = Image.open(image_path).convert("RGB")
-            img_width, img_height = image.size
+        # Get dimensions
+        img_width, img_height = image.size
 
-            # Convert normalized bbox [0-1000] to pixel coordinates
-            x1 = int((bbox[0] / 1000.0) * img_width)
-            y1 = int((bbox[1] / 1000.0) * img_height)
-            x2 = int((bbox[2] / 1000.0) * img_width)
-            y2 = int((bbox[3] / 1000.0) * img_height)
+        # Convert normalized bbox [0-1000] to pixel coordinates in the image
+        x1, y1, x2, y2 = bbox_to_pixels(bbox, img_width, img_height)
 
-            # Ensure coordinates are valid
-            x1, x2 = max(0, min(x1, img_width)), max(0, min(x2, img_width))
-            y1, y2 = max(0, min(y1, img_height)), max(0, min(y2, img_height))
+        # Crop image to bbox - only this region gets converted to grayscale
+        cropped_image = image.crop((x1, y1, x2, y2))
+        # crop() copies the region - drop the page so it isn't held through OCR
+        # (cached PDF renders stay alive in the render cache)
+        del image
 
-            # Crop image to bbox
-            cropped_image = image.crop((x1, y1, x2, y2))
+        logger.info(
+            f"Batch extracting from region: ({x1}, {y1}) to ({x2}, {y2}), size: {cropped_image.size}"
+        )
 
-            logger.info(
-                f"Batch extracting from region: ({x1}, {y1}) to ({x2}, {y2}), size: {cropped_image.size}"
+        # Preprocess image
+        cropped_gray = cropped_image.convert("L")
+        cropped_enhanced = stretch_contrast(cropped_gray)
+
+        # Upscale if needed (bilinear - small crops don't need Lanczos)
+        min_height = 50
+        if cropped_enhanced.size[1] < min_height:
+            scale_factor = min_height / cropped_enhanced.size[1]
+            new_size = (
+                int(cropped_enhanced.size[0] * scale_factor),
+                int(cropped_enhanced.size[1] * scale_factor),
             )
-
-            # Preprocess image
-            cropped_gray = cropped_image.convert("L")
-            from PIL import ImageEnhance
-
-            enhancer = ImageEnhance.Contrast(cropped_gray)
-            cropped_enhanced = enhancer.enhance(2.0)
-
-            # Upscale if needed
-            min_height = 50
-            if cropped_enhanced.size[1] < min_height:
-                scale_factor = min_height / cropped_enhanced.size[1]
-                new_size = (
-                    int(cropped_enhanced.size[0] * scale_factor),
-                    int(cropped_enhanced.size[1] * scale_factor),
-                )
-                cropped_enhanced = cropped_enhanced.resize(
-                    new_size, Image.Resampling.LANCZOS
-                )
-
-            # Get word-level OCR data using Tesseract
-            ocr_data = pytesseract.image_to_data(
-                cropped_enhanced,
-                output_type=pytesseract.Output.DICT,
-                config="--psm 6 --oem 3",  # psm 6: Assume uniform block of text
+            cropped_enhanced = cropped_enhanced.resize(
+                new_size, Image.Resampling.BILINEAR
             )
 
-            # Extract individual words/values with their bounding boxes
-            fields = []
-            for i in range(len(ocr_data["text"])):
-                text = ocr_data["text"][i].strip()
-                conf = int(ocr_data["conf"][i])
-
-                # Only keep text with good confidence and non-empty
-                if text and conf > 30:  # Lower threshold for batch extraction
-                    # Get word bounding box in cropped image
-                    word_x = ocr_data["left"][i]
-                    word_y = ocr_data["top"][i]
-                    word_w = ocr_data["width"][i]
-                    word_h = ocr_data["height"][i]
-
-                    # Convert back to full image coordinates
-                    abs_x1 = x1 + word_x
-                    abs_y1 = y1 + word_y
-                    abs_x2 = abs_x1 + word_w
-                    abs_y2 = abs_y1 + word_h
-
-                    # Convert to normalized coordinates [0-1000]
-                    norm_bbox = [
-                        int((abs_x1 / img_width) * 1000),
-                        int((abs_y1 / img_height) * 1000),
-                        int((abs_x2 / img_width) * 1000),
-                        int((abs_y2 / img_height) * 1000),
-                    ]
+        if OCR_BINARIZE:
+            cropped_enhanced = otsu_binarize(cropped_enhanced)
 
-                    fields.append(
-                        {"value": text, "bbox": norm_bbox, "confidence": conf / 100.0}
-                    )
+        # Get word-level OCR data using Tesseract
+        texts, confs, bboxes = cached_tesseract_word_columns(
+            cropped_enhanced,
+            config="--psm 6 --oem 3",  # psm 6: Assume uniform block of text
+        )
 
-            logger.info(f"Batch extraction found {len(fields)} values")
+        # Only keep text with good confidence (text is never empty)
+        keep = confs > 30  # Lower threshold for batch extraction
 
-            return jsonify(
-                {
-                    "status": "success",
-                    "fields": fields,
-                    "message": f"Extracted {len(fields)} instances",
-                }
+        # Convert word bboxes back to full image coordinates, then normalize [0-1000]
+        norm_bboxes = normalize_bboxes(
+            bboxes[keep] + np.array([x1, y1, x1, y1]), img_width, img_height
+        )
+
+        # Extract individual words/values with their bounding boxes
+        fields = [
+            {"value": text, "bbox": norm_bbox, "confidence": conf / 100.0}
+            for text, norm_bbox, conf in zip(
+                compress(texts, keep), norm_bboxes.tolist(), confs[keep].tolist()
             )
+        ]
 
-        finally:
-            # Cleanup temp files
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
-            if doc_format == "pdf" and os.path.exists(image_path):
-                os.unlink(image_path)
+        logger.info(f"Batch extraction found {len(fields)} values")
+
+        return jsonify(
+            {
+                "status": "success",
+                "fields": fields,
+                "message": f"Extracted {len(fields)} instances",
+            }
+        )
 
     except Exception as e:
         logger.error(f"Error in batch extraction: {e}", exc_info=True)
@@ -2353,148 +3911,136 @@ def detect_text_bboxes():
             return jsonify({"error": "Missing image data"}), 400
 
         # Decode base64 document
-        doc_data = base64.b64decode(data["image"])
+        doc_data = decode_document_data(data["image"])
         doc_format = data.get("format", "png").lower()
         page_num = data.get("page", 1)
         exclude_bboxes = data.get(
             "exclude_bboxes", []
         )  # Already extracted fields to exclude
 
-        # Save to temp file
-        with tempfile.NamedTemporaryFile(suffix=f".{doc_format}", delete=False) as tmp:
-            tmp.write(doc_data)
-            tmp_path = tmp.name
-
-        try:
-            # Convert PDF to image if needed
-            image_path = tmp_path
-            if doc_format == "pdf":
-                logger.info(
-                    f"Converting PDF page {page_num} to image for text detection"
-                )
-                images = convert_from_path(
-                    tmp_path, first_page=page_num, last_page=page_num, dpi=200
-                )
-
-                if not images:
-                    return jsonify({"error": "PDF has no pages"}), 400
-
-                page_image_path = tmp_path.replace(".pdf", ".png")
-                images[0].save(page_image_path, "PNG")
-                image_path = page_image_path
-
-            # Open image to get dimensions
-            image = Image.open(image_path).convert("RGB")
-            img_width, img_height = image.size
+        # Decode the page in memory
+        if doc_format == "pdf":
+            logger.info(f"Converting PDF page {page_num} to image for text detection")
+        # PDF pages are rendered straight at the OCR height cap below rather
+        # than rendered at full 200dpi and LANCZOS-downscaled afterwards
+        image = load_document_image(
+            doc_data, doc_format, page_num, dpi=200, mode="L", max_height=2000
+        )
+        if image is None:
+            return jsonify({"error": "PDF has no pages"}), 400
 
-            logger.info(f"Detecting text bboxes in {img_width}x{img_height} image")
+        # Get dimensions
+        img_width, img_height = image.size
 
-            # Don't resize - work with original image for accurate bboxes
-            # Use faster OCR settings instead
-            image_gray = image.convert("L")
-            from PIL import ImageEnhance
+        logger.info(f"Detecting text bboxes in {img_width}x{img_height} image")
 
-            enhancer = ImageEnhance.Contrast(image_gray)
-            image_enhanced = enhancer.enhance(1.3)
+        # Uploads are decoded and PDF pages rasterized straight to grayscale
+        image_gray = image
 
-            # Get word-level OCR data using Tesseract
-            # PSM 6 = Uniform block of text
-            # OEM 1 = LSTM only (best accuracy)
-            logger.info("Running Tesseract OCR for text detection...")
-            ocr_data = pytesseract.image_to_data(
-                image_enhanced,
-                output_type=pytesseract.Output.DICT,
-                config="--psm 3 --oem 1",  # PSM 3 for better accuracy on complex layouts
+        # Downscale tall pages - Tesseract time grows with pixel count and 2000px
+        # still leaves text lines well above its sweet spot. Word bboxes are
+        # scaled back to the original image below.
+        scale = min(1.0, 2000.0 / img_height)
+        if scale < 1.0:
+            image_gray = image_gray.resize(
+                (round(img_width * scale), round(img_height * scale)),
+                Image.Resampling.LANCZOS,
             )
-
-            # Helper function to check if bbox overlaps with existing fields
-            def overlaps_with_existing(bbox, existing_bboxes, threshold=0.5):
-                """Check if bbox significantly overlaps with any existing bbox"""
-                x1, y1, x2, y2 = bbox
-                area = (x2 - x1) * (y2 - y1)
-                if area == 0:
-                    return False
-
-                for ex_bbox in existing_bboxes:
-                    ex_x1, ex_y1, ex_x2, ex_y2 = ex_bbox
-                    # Calculate intersection
-                    int_x1 = max(x1, ex_x1)
-                    int_y1 = max(y1, ex_y1)
-                    int_x2 = min(x2, ex_x2)
-                    int_y2 = min(y2, ex_y2)
-
-                    if int_x1 < int_x2 and int_y1 < int_y2:
-                        intersection = (int_x2 - int_x1) * (int_y2 - int_y1)
-                        overlap_ratio = intersection / area
-                        if overlap_ratio > threshold:
-                            return True
-                return False
-
-            # Extract individual text elements with their bounding boxes
-            text_bboxes = []
-            bbox_id = 0
-            excluded_count = 0
-
-            for i in range(len(ocr_data["text"])):
-                text = ocr_data["text"][i].strip()
-                conf = int(ocr_data["conf"][i])
-
-                # Only keep text with reasonable confidence and non-empty
-                if text and conf > 30:  # Lower threshold for more detection
-                    # Get word bounding box in original image coordinates
-                    x = ocr_data["left"][i]
-                    y = ocr_data["top"][i]
-                    w = ocr_data["width"][i]
-                    h = ocr_data["height"][i]
-
-                    # Add padding around bbox to prevent text cutoff (6px on each side for better accuracy)
-                    padding_px = 6
-                    x = max(0, x - padding_px)
-                    y = max(0, y - padding_px)
-                    w = min(img_width - x, w + (padding_px * 2))
-                    h = min(img_height - y, h + (padding_px * 2))
-
-                    # Convert to normalized coordinates [0-1000]
-                    norm_bbox = [
-                        int((x / img_width) * 1000),
-                        int((y / img_height) * 1000),
-                        int(((x + w) / img_width) * 1000),
-                        int(((y + h) / img_height) * 1000),
-                    ]
-
-                    # Skip if overlaps with existing extracted fields
-                    if overlaps_with_existing(norm_bbox, exclude_bboxes):
-                        excluded_count += 1
-                        continue
-
-                    text_bboxes.append(
-                        {
-                            "id": f"ocr_{bbox_id}",
-                            "text": text,
-                            "bbox": norm_bbox,
-                            "confidence": conf / 100.0,
-                        }
-                    )
-                    bbox_id += 1
-
-            logger.info(
-                f"Detected {len(text_bboxes)} text bboxes (excluded {excluded_count} overlapping with existing fields)"
+            logger.info(f"Downscaled to {image_gray.width}x{image_gray.height} for OCR")
+
+        image_enhanced = enhance_contrast(image_gray, 1.3)
+        # Only the enhanced copy is OCR'd - release the decoded page early
+        del image, image_gray
+
+        # Get word-level OCR data using Tesseract, page strips in parallel
+        # PSM 3 for better accuracy on complex layouts
+        # OEM 1 = LSTM only (best accuracy)
+        logger.info("Running Tesseract OCR for text detection...")
+        texts, confs, bboxes = tesseract_word_columns_in_strips(
+            image_enhanced, config="--psm 3 --oem 1"
+        )
+        if scale < 1.0:
+            bboxes = np.rint(bboxes / scale).astype(np.int32)
+
+        # Existing field bboxes as one array, checked against each word at once
+        exclude_array = np.asarray(exclude_bboxes, dtype=np.float64).reshape(-1, 4)
+
+        # Helper function to check which bboxes overlap with existing fields
+        def overlaps_with_existing(bboxes, threshold=0.5):
+            """Flag each bbox that significantly overlaps with any existing bbox"""
+            if not len(exclude_array) or not len(bboxes):
+                return np.zeros(len(bboxes), dtype=bool)
+
+            # Intersection of every bbox with every existing bbox (N x M),
+            # zero where they don't meet
+            new = bboxes[:, None, :]
+            ex = exclude_array[None, :, :]
+            int_w = np.minimum(new[..., 2], ex[..., 2]) - np.maximum(
+                new[..., 0], ex[..., 0]
             )
+            int_h = np.minimum(new[..., 3], ex[..., 3]) - np.maximum(
+                new[..., 1], ex[..., 1]
+            )
+            intersection = np.clip(int_w, 0, None) * np.clip(int_h, 0, None)
+
+            area = (bboxes[:, 2] - bboxes[:, 0]) * (bboxes[:, 3] - bboxes[:, 1])
+            with np.errstate(divide="ignore", invalid="ignore"):
+                overlap_ratio = intersection / area[:, None]
+            return (area != 0) & (overlap_ratio > threshold).any(axis=1)
+
+        # Only keep text with reasonable confidence (text is never empty)
+        keep = confs > 30  # Lower threshold for more detection
+        texts = list(compress(texts, keep))
+        confs = confs[keep]
+        x, y, x2, y2 = bboxes[keep].T.astype(np.int64)
+
+        # Add padding around bbox to prevent text cutoff (6px on each side for better accuracy)
+        padding_px = 6
+        w = x2 - x + padding_px * 2
+        h = y2 - y + padding_px * 2
+        x = np.maximum(0, x - padding_px)
+        y = np.maximum(0, y - padding_px)
+        w = np.minimum(img_width - x, w)
+        h = np.minimum(img_height - y, h)
+
+        # Convert to normalized coordinates [0-1000]
+        norm_bboxes = normalize_bboxes(
+            np.stack([x, y, x + w, y + h], axis=1), img_width, img_height
+        )
 
-            return jsonify(
-                {
-                    "status": "success",
-                    "text_bboxes": text_bboxes,
-                    "image_size": {"width": img_width, "height": img_height},
-                }
+        # Skip words that overlap with existing extracted fields
+        excluded = overlaps_with_existing(norm_bboxes)
+        excluded_count = int(excluded.sum())
+        kept = ~excluded
+
+        # Extract individual text elements with their bounding boxes
+        text_bboxes = [
+            {
+                "id": f"ocr_{bbox_id}",
+                "text": text,
+                "bbox": norm_bbox,
+                "confidence": conf / 100.0,
+            }
+            for bbox_id, (text, norm_bbox, conf) in enumerate(
+                zip(
+                    compress(texts, kept),
+                    norm_bboxes[kept].tolist(),
+                    confs[kept].tolist(),
+                )
             )
+        ]
 
-        finally:
-            # Cleanup temp files
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
-            if doc_format == "pdf" and os.path.exists(image_path):
-                os.unlink(image_path)
+        logger.info(
+            f"Detected {len(text_bboxes)} text bboxes (excluded {excluded_count} overlapping with existing fields)"
+        )
+
+        return json_response(
+            {
+                "status": "success",
+                "text_bboxes": text_bboxes,
+                "image_size": {"width": img_width, "height": img_height},
+            }
+        )
 
     except Exception as e:
         logger.error(f"Error in text bbox detection: {e}", exc_info=True)
@@ -2534,7 +4080,7 @@ def apply_template_intelligent():
         if _doc_qa_pipeline is None:
             load_layoutlm_model()
 
-        doc_data = base64.b64decode(data["image"])
+        doc_data = decode_document_data(data["image"])
         doc_format = data.get("format", "pdf").lower()
         source_page = data.get("source_page", 1)
         target_page = data.get("target_page", 1)
@@ -2547,516 +4093,477 @@ def apply_template_intelligent():
             f"[/apply-template-intelligent] Mode: {'Column detection' if same_page else 'Cross-page'}, Page: {target_page}, Templates: {len(template_fields)}"
         )
 
-        tmp_path = None
-        image_path = None
+        # Render the target page in-process (PyMuPDF) - no temp files or
+        # pdftoppm subprocess per request
+        image = load_document_image(doc_data, doc_format, target_page, dpi=200)
+        if image is None:
+            return (
+                jsonify({"error": f"Failed to convert page {target_page}"}),
+                500,
+            )
 
-        try:
-            # Process image
-            if doc_format == "pdf":
-                tmp_path = "/tmp/temp_doc_template.pdf"
-                with open(tmp_path, "wb") as f:
-                    f.write(doc_data)
+        img_width, img_height = image.size
+        logger.info(
+            f"[/apply-template-intelligent] Image size: {img_width}x{img_height}"
+        )
 
-                images = convert_from_path(
-                    tmp_path, first_page=target_page, last_page=target_page, dpi=200
-                )
-                if not images:
-                    return (
-                        jsonify({"error": f"Failed to convert page {target_page}"}),
-                        500,
-                    )
+        # IMPROVED OCR: Use PSM 6 for table/block text instead of PSM 3
+        # PSM 6 assumes uniform block of text (better for tables)
+        texts, confs, bboxes = tesseract_word_columns(image, config="--psm 6")
 
-                image = images[0]
+        # The LayoutLM fallbacks below reuse these words, so the pipeline
+        # doesn't run its own Tesseract pass for every question
+        word_boxes = list(
+            zip(texts, normalize_bboxes(bboxes, img_width, img_height).tolist())
+        )
 
-                # Save image for OCR
-                image_path = "/tmp/temp_page.png"
-                image.save(image_path)
-            else:
-                import io
+        # Build enhanced text blocks with better filtering (confidences
+        # parsed and filtered as one array, whole-number like Output.DICT)
+        confs = confs.astype(np.int64)
+        # Lower confidence threshold and accept more text
+        keep = confs > 20  # Reduced from 30 to 20
+        bboxes = bboxes[keep]
+
+        text_blocks = [
+            {
+                "text": text,
+                "bbox": norm_bbox,
+                "pixel_bbox": pixel_bbox,
+                "conf": conf,
+            }
+            for text, norm_bbox, pixel_bbox, conf in zip(
+                compress(texts, keep),
+                normalize_bboxes(bboxes, img_width, img_height).tolist(),
+                bboxes.tolist(),
+                confs[keep].tolist(),
+            )
+        ]
 
-                image = Image.open(io.BytesIO(doc_data)).convert("RGB")
-                image_path = "/tmp/temp_page.png"
-                image.save(image_path)
+        logger.info(
+            f"[/apply-template-intelligent] OCR found {len(text_blocks)} text blocks"
+        )
 
-            img_width, img_height = image.size
+        # Log sample for debugging
+        if text_blocks:
+            sample_texts = [b["text"] for b in text_blocks[:20]]
             logger.info(
-                f"[/apply-template-intelligent] Image size: {img_width}x{img_height}"
+                f"[/apply-template-intelligent] Sample OCR text: {sample_texts}"
             )
 
-            # IMPROVED OCR: Use PSM 6 for table/block text instead of PSM 3
-            # PSM 6 assumes uniform block of text (better for tables)
-            ocr_result = pytesseract.image_to_data(
-                image, output_type=pytesseract.Output.DICT, config="--psm 6"
-            )
+        if not template_fields:
+            return jsonify({"error": "No template fields provided"}), 400
+
+        # Analyze template pattern
+        template_x_positions = []
+        template_y_positions = []
+        template_values = []
+
+        for t in template_fields:
+            bbox = t.get("bbox", [0, 0, 1000, 1000])
+            center_x = (bbox[0] + bbox[2]) / 2
+            center_y = (bbox[1] + bbox[3]) / 2
+            template_x_positions.append(center_x)
+            template_y_positions.append(center_y)
+            template_values.append(t.get("value", ""))
+
+        x_variance = (
+            max(template_x_positions) - min(template_x_positions)
+            if template_x_positions
+            else 0
+        )
+        y_variance = (
+            max(template_y_positions) - min(template_y_positions)
+            if template_y_positions
+            else 0
+        )
 
-            # Build enhanced text blocks with better filtering
-            text_blocks = []
-            for i in range(len(ocr_result["text"])):
-                text = ocr_result["text"][i].strip()
-                conf = int(ocr_result["conf"][i])
-
-                # Lower confidence threshold and accept more text
-                if text and conf > 20:  # Reduced from 30 to 20
-                    x, y = ocr_result["left"][i], ocr_result["top"][i]
-                    w, h = ocr_result["width"][i], ocr_result["height"][i]
-
-                    norm_bbox = [
-                        int((x / img_width) * 1000),
-                        int((y / img_height) * 1000),
-                        int(((x + w) / img_width) * 1000),
-                        int(((y + h) / img_height) * 1000),
-                    ]
+        is_column_pattern = x_variance < 100
+        avg_template_x = sum(template_x_positions) / len(template_x_positions)
+        min_template_y = min(template_y_positions)
+        max_template_y = max(template_y_positions)
 
-                    text_blocks.append(
-                        {
-                            "text": text,
-                            "bbox": norm_bbox,
-                            "pixel_bbox": [x, y, x + w, y + h],
-                            "conf": conf,
-                        }
-                    )
+        logger.info(
+            f"[/apply-template-intelligent] Pattern: {'COLUMN' if is_column_pattern else 'SCATTERED'}, "
+            f"X_var={x_variance:.1f}, Y_var={y_variance:.1f}, Avg_X={avg_template_x:.1f}"
+        )
 
-            logger.info(
-                f"[/apply-template-intelligent] OCR found {len(text_blocks)} text blocks"
-            )
+        extracted_fields = []
 
-            # Log sample for debugging
-            if text_blocks:
-                sample_texts = [b["text"] for b in text_blocks[:20]]
-                logger.info(
-                    f"[/apply-template-intelligent] Sample OCR text: {sample_texts}"
-                )
+        if same_page and suggest_columns and is_column_pattern:
+            # COLUMN DETECTION MODE with SEMANTIC UNDERSTANDING
+            logger.info("[/apply-template-intelligent] Column detection mode activated")
 
-            if not template_fields:
-                return jsonify({"error": "No template fields provided"}), 400
-
-            # Analyze template pattern
-            template_x_positions = []
-            template_y_positions = []
-            template_values = []
-
-            for t in template_fields:
-                bbox = t.get("bbox", [0, 0, 1000, 1000])
-                center_x = (bbox[0] + bbox[2]) / 2
-                center_y = (bbox[1] + bbox[3]) / 2
-                template_x_positions.append(center_x)
-                template_y_positions.append(center_y)
-                template_values.append(t.get("value", ""))
-
-            x_variance = (
-                max(template_x_positions) - min(template_x_positions)
-                if template_x_positions
-                else 0
-            )
-            y_variance = (
-                max(template_y_positions) - min(template_y_positions)
-                if template_y_positions
-                else 0
-            )
+            # Step 1: Find potential headers ABOVE the template region
+            header_y_max = (
+                min_template_y - 20
+            )  # Headers should be at least 2% above data
+            potential_headers_raw = []
+
+            for block in text_blocks:
+                block_center_y = (block["bbox"][1] + block["bbox"][3]) / 2
 
-            is_column_pattern = x_variance < 100
-            avg_template_x = sum(template_x_positions) / len(template_x_positions)
-            min_template_y = min(template_y_positions)
-            max_template_y = max(template_y_positions)
+                # Must be above template rows
+                if block_center_y < header_y_max:
+                    potential_headers_raw.append(block)
 
             logger.info(
-                f"[/apply-template-intelligent] Pattern: {'COLUMN' if is_column_pattern else 'SCATTERED'}, "
-                f"X_var={x_variance:.1f}, Y_var={y_variance:.1f}, Avg_X={avg_template_x:.1f}"
+                f"[/apply-template-intelligent] Found {len(potential_headers_raw)} raw header blocks"
             )
 
-            extracted_fields = []
+            # Step 1.5: MERGE ADJACENT HEADER BLOCKS (e.g., "Material" + "No." → "Material No.")
+            # Sort by Y then X to process left-to-right, top-to-bottom
+            potential_headers_raw.sort(key=lambda b: (b["bbox"][1], b["bbox"][0]))
+
+            merged_headers = []
+            i = 0
+            while i < len(potential_headers_raw):
+                current = potential_headers_raw[i]
+                merged_text = current["text"]
+                merged_bbox = current["bbox"].copy()
+                merged_conf = current["conf"]
+
+                # Look ahead for adjacent blocks (same row, close X position)
+                j = i + 1
+                while j < len(potential_headers_raw):
+                    next_block = potential_headers_raw[j]
+
+                    # Check if on same row (Y within 10 units = 1%)
+                    y_diff = abs(current["bbox"][1] - next_block["bbox"][1])
+                    # Check if horizontally adjacent (X gap < 30 units = 3%)
+                    x_gap = next_block["bbox"][0] - merged_bbox[2]
+
+                    if y_diff < 10 and 0 <= x_gap < 30:
+                        # Merge this block
+                        merged_text += " " + next_block["text"]
+                        merged_bbox[2] = next_block["bbox"][2]  # Extend right edge
+                        merged_bbox[3] = max(
+                            merged_bbox[3], next_block["bbox"][3]
+                        )  # Max bottom
+                        merged_conf = max(merged_conf, next_block["conf"])
+                        j += 1
+                    else:
+                        break
 
-            if same_page and suggest_columns and is_column_pattern:
-                # COLUMN DETECTION MODE with SEMANTIC UNDERSTANDING
-                logger.info(
-                    "[/apply-template-intelligent] Column detection mode activated"
+                merged_headers.append(
+                    {
+                        "text": merged_text,
+                        "bbox": merged_bbox,
+                        "conf": merged_conf,
+                    }
                 )
 
-                # Step 1: Find potential headers ABOVE the template region
-                header_y_max = (
-                    min_template_y - 20
-                )  # Headers should be at least 2% above data
-                potential_headers_raw = []
-
-                for block in text_blocks:
-                    block_center_y = (block["bbox"][1] + block["bbox"][3]) / 2
+                i = j if j > i + 1 else i + 1
 
-                    # Must be above template rows
-                    if block_center_y < header_y_max:
-                        potential_headers_raw.append(block)
+            potential_headers = merged_headers
+            logger.info(
+                f"[/apply-template-intelligent] Merged into {len(potential_headers)} complete headers: "
+                f"{[h['text'] for h in potential_headers[:10]]}"
+            )
 
-                logger.info(
-                    f"[/apply-template-intelligent] Found {len(potential_headers_raw)} raw header blocks"
-                )
+            # Step 2: Group all text blocks into columns by X position
+            columns = {}
+            x_tolerance = 60  # 6% tolerance
 
-                # Step 1.5: MERGE ADJACENT HEADER BLOCKS (e.g., "Material" + "No." → "Material No.")
-                # Sort by Y then X to process left-to-right, top-to-bottom
-                potential_headers_raw.sort(key=lambda b: (b["bbox"][1], b["bbox"][0]))
-
-                merged_headers = []
-                i = 0
-                while i < len(potential_headers_raw):
-                    current = potential_headers_raw[i]
-                    merged_text = current["text"]
-                    merged_bbox = current["bbox"].copy()
-                    merged_conf = current["conf"]
-
-                    # Look ahead for adjacent blocks (same row, close X position)
-                    j = i + 1
-                    while j < len(potential_headers_raw):
-                        next_block = potential_headers_raw[j]
-
-                        # Check if on same row (Y within 10 units = 1%)
-                        y_diff = abs(current["bbox"][1] - next_block["bbox"][1])
-                        # Check if horizontally adjacent (X gap < 30 units = 3%)
-                        x_gap = next_block["bbox"][0] - merged_bbox[2]
-
-                        if y_diff < 10 and 0 <= x_gap < 30:
-                            # Merge this block
-                            merged_text += " " + next_block["text"]
-                            merged_bbox[2] = next_block["bbox"][2]  # Extend right edge
-                            merged_bbox[3] = max(
-                                merged_bbox[3], next_block["bbox"][3]
-                            )  # Max bottom
-                            merged_conf = max(merged_conf, next_block["conf"])
-                            j += 1
-                        else:
-                            break
+            for block in text_blocks:
+                block_center_x = (block["bbox"][0] + block["bbox"][2]) / 2
+                block_center_y = (block["bbox"][1] + block["bbox"][3]) / 2
 
-                    merged_headers.append(
-                        {
-                            "text": merged_text,
-                            "bbox": merged_bbox,
-                            "conf": merged_conf,
-                        }
-                    )
+                # Skip template column
+                if abs(block_center_x - avg_template_x) < x_tolerance:
+                    continue
 
-                    i = j if j > i + 1 else i + 1
+                # Skip if not in data region (below headers)
+                if block_center_y < min_template_y - 50:
+                    continue
 
-                potential_headers = merged_headers
-                logger.info(
-                    f"[/apply-template-intelligent] Merged into {len(potential_headers)} complete headers: "
-                    f"{[h['text'] for h in potential_headers[:10]]}"
-                )
+                # Find or create column
+                found = False
+                for col_x in list(columns.keys()):
+                    if abs(block_center_x - col_x) < x_tolerance:
+                        columns[col_x].append(block)
+                        found = True
+                        break
 
-                # Step 2: Group all text blocks into columns by X position
-                columns = {}
-                x_tolerance = 60  # 6% tolerance
+                if not found:
+                    columns[block_center_x] = [block]
 
-                for block in text_blocks:
-                    block_center_x = (block["bbox"][0] + block["bbox"][2]) / 2
-                    block_center_y = (block["bbox"][1] + block["bbox"][3]) / 2
+            logger.info(
+                f"[/apply-template-intelligent] Grouped into {len(columns)} columns"
+            )
 
-                    # Skip template column
-                    if abs(block_center_x - avg_template_x) < x_tolerance:
-                        continue
+            # Step 2.5: CONSERVATIVE LayoutLM usage - only for truly missing headers
+            # Reduce AI reliance, prioritize template-based matching
+            layoutlm_headers = []
+            use_layoutlm = data.get("use_ai_fallback", False)  # User must opt-in
+
+            if (
+                use_layoutlm
+                and len(potential_headers) < (len(columns) * 0.5)
+                and _doc_qa_pipeline
+            ):
+                # Only use if more than 50% of headers are missing
+                try:
+                    logger.info(
+                        "[/apply-template-intelligent] LayoutLM fallback activated (>50% headers missing)..."
+                    )
+                    with torch.inference_mode():
+                        result = _doc_qa_pipeline(
+                            image=image,
+                            question="What are all the column headers in the table?",
+                            word_boxes=word_boxes,
+                        )
 
-                    # Skip if not in data region (below headers)
-                    if block_center_y < min_template_y - 50:
-                        continue
+                    if result and isinstance(result, dict):
+                        answer = result.get("answer", "")
+                        if answer and answer != "None":
+                            # Parse comma-separated or space-separated headers
+                            llm_headers = [
+                                h.strip()
+                                for h in answer.replace(",", " ").split()
+                                if h.strip()
+                            ]
+                            layoutlm_headers = llm_headers
+                            logger.info(
+                                f"[/apply-template-intelligent] LayoutLM found headers: {llm_headers}"
+                            )
+                except Exception as e:
+                    logger.warning(
+                        f"[/apply-template-intelligent] LayoutLM Q&A failed: {e}"
+                    )
+            else:
+                logger.info(
+                    f"[/apply-template-intelligent] Skipping LayoutLM (template-based mode, {len(potential_headers)} headers found)"
+                )
 
-                    # Find or create column
-                    found = False
-                    for col_x in list(columns.keys()):
-                        if abs(block_center_x - col_x) < x_tolerance:
-                            columns[col_x].append(block)
-                            found = True
-                            break
+            # Combine OCR and LayoutLM headers
+            all_header_texts = [h["text"] for h in potential_headers] + layoutlm_headers
+            logger.info(
+                f"[/apply-template-intelligent] Total headers available: {all_header_texts}"
+            )
 
-                    if not found:
-                        columns[block_center_x] = [block]
+            # Step 3: For each column, find its header and match rows
+            # Build a map of template field names for semantic matching
+            template_field_names = [
+                t.get("field_name", "").lower().replace("_", " ")
+                for t in template_fields
+            ]
 
-                logger.info(
-                    f"[/apply-template-intelligent] Grouped into {len(columns)} columns"
-                )
+            for col_x, col_blocks in columns.items():
+                if len(col_blocks) < 1:
+                    continue
 
-                # Step 2.5: CONSERVATIVE LayoutLM usage - only for truly missing headers
-                # Reduce AI reliance, prioritize template-based matching
-                layoutlm_headers = []
-                use_layoutlm = data.get("use_ai_fallback", False)  # User must opt-in
-
-                if (
-                    use_layoutlm
-                    and len(potential_headers) < (len(columns) * 0.5)
-                    and _doc_qa_pipeline
-                ):
-                    # Only use if more than 50% of headers are missing
-                    try:
-                        logger.info(
-                            "[/apply-template-intelligent] LayoutLM fallback activated (>50% headers missing)..."
-                        )
-                        result = _doc_qa_pipeline(
-                            image=image,
-                            question="What are all the column headers in the table?",
+                # Find header for this column using HYBRID approach:
+                # 1. Spatial proximity (closest by X position)
+                # 2. Semantic similarity (fuzzy match with template field names)
+                column_header = None
+                min_x_dist = float("inf")
+                best_semantic_score = 0
+
+                # First pass: spatial proximity
+                for header in potential_headers:
+                    header_center_x = (header["bbox"][0] + header["bbox"][2]) / 2
+                    x_dist = abs(header_center_x - col_x)
+
+                    if x_dist < 80:  # Within 8%
+                        # Calculate semantic similarity with template fields
+                        _, max_similarity = best_fuzzy_match(
+                            header["text"].lower(), template_field_names
                         )
 
-                        if result and isinstance(result, dict):
-                            answer = result.get("answer", "")
-                            if answer and answer != "None":
-                                # Parse comma-separated or space-separated headers
-                                llm_headers = [
-                                    h.strip()
-                                    for h in answer.replace(",", " ").split()
-                                    if h.strip()
-                                ]
-                                layoutlm_headers = llm_headers
-                                logger.info(
-                                    f"[/apply-template-intelligent] LayoutLM found headers: {llm_headers}"
-                                )
-                    except Exception as e:
-                        logger.warning(
-                            f"[/apply-template-intelligent] LayoutLM Q&A failed: {e}"
-                        )
+                        # Weighted score: 60% spatial + 40% semantic
+                        spatial_score = 1.0 - (x_dist / 80.0)  # Normalize to 0-1
+                        combined_score = 0.6 * spatial_score + 0.4 * max_similarity
+
+                        if combined_score > best_semantic_score:
+                            best_semantic_score = combined_score
+                            column_header = header
+                            min_x_dist = x_dist
+
+                # Generate field name from header or position
+                if column_header:
+                    # Clean up header text for field name
+                    header_text = column_header["text"]
+                    suggested_field_name = (
+                        header_text.lower()
+                        .replace(" ", "_")
+                        .replace("/", "_")
+                        .replace(".", "")
+                        .replace("-", "_")
+                        .strip("_")
+                    )
+                    logger.info(
+                        f"[/apply-template-intelligent] Column at X={col_x:.0f} has header: '{header_text}' → {suggested_field_name} (score={best_semantic_score:.2f})"
+                    )
                 else:
+                    suggested_field_name = f"column_{int(col_x)}"
                     logger.info(
-                        f"[/apply-template-intelligent] Skipping LayoutLM (template-based mode, {len(potential_headers)} headers found)"
+                        f"[/apply-template-intelligent] Column at X={col_x:.0f} has NO header, using: {suggested_field_name}"
                     )
 
-                # Combine OCR and LayoutLM headers
-                all_header_texts = [
-                    h["text"] for h in potential_headers
-                ] + layoutlm_headers
-                logger.info(
-                    f"[/apply-template-intelligent] Total headers available: {all_header_texts}"
+                # Sort column blocks by Y position
+                col_blocks_sorted = sorted(
+                    col_blocks, key=lambda b: (b["bbox"][1] + b["bbox"][3]) / 2
                 )
 
-                # Step 3: For each column, find its header and match rows
-                # Build a map of template field names for semantic matching
-                from difflib import SequenceMatcher
-
-                def fuzzy_match_score(a, b):
-                    """Calculate similarity between two strings (0-1)"""
-                    return SequenceMatcher(None, a.lower(), b.lower()).ratio()
-
-                template_field_names = [
-                    t.get("field_name", "").lower().replace("_", " ")
-                    for t in template_fields
-                ]
-
-                for col_x, col_blocks in columns.items():
-                    if len(col_blocks) < 1:
-                        continue
-
-                    # Find header for this column using HYBRID approach:
-                    # 1. Spatial proximity (closest by X position)
-                    # 2. Semantic similarity (fuzzy match with template field names)
-                    column_header = None
-                    min_x_dist = float("inf")
-                    best_semantic_score = 0
-
-                    # First pass: spatial proximity
-                    for header in potential_headers:
-                        header_center_x = (header["bbox"][0] + header["bbox"][2]) / 2
-                        x_dist = abs(header_center_x - col_x)
-
-                        if x_dist < 80:  # Within 8%
-                            # Calculate semantic similarity with template fields
-                            max_similarity = 0
-                            for template_name in template_field_names:
-                                similarity = fuzzy_match_score(
-                                    header["text"], template_name
-                                )
-                                max_similarity = max(max_similarity, similarity)
-
-                            # Weighted score: 60% spatial + 40% semantic
-                            spatial_score = 1.0 - (x_dist / 80.0)  # Normalize to 0-1
-                            combined_score = 0.6 * spatial_score + 0.4 * max_similarity
-
-                            if combined_score > best_semantic_score:
-                                best_semantic_score = combined_score
-                                column_header = header
-                                min_x_dist = x_dist
-
-                    # Generate field name from header or position
-                    if column_header:
-                        # Clean up header text for field name
-                        header_text = column_header["text"]
-                        suggested_field_name = (
-                            header_text.lower()
-                            .replace(" ", "_")
-                            .replace("/", "_")
-                            .replace(".", "")
-                            .replace("-", "_")
-                            .strip("_")
-                        )
-                        logger.info(
-                            f"[/apply-template-intelligent] Column at X={col_x:.0f} has header: '{header_text}' → {suggested_field_name} (score={best_semantic_score:.2f})"
-                        )
-                    else:
-                        suggested_field_name = f"column_{int(col_x)}"
-                        logger.info(
-                            f"[/apply-template-intelligent] Column at X={col_x:.0f} has NO header, using: {suggested_field_name}"
-                        )
-
-                    # Sort column blocks by Y position
-                    col_blocks_sorted = sorted(
-                        col_blocks, key=lambda b: (b["bbox"][1] + b["bbox"][3]) / 2
-                    )
+                # Match each template Y position to closest block in this column
+                for template_idx, template_y in enumerate(template_y_positions):
+                    closest_block = None
+                    min_y_diff = float("inf")
 
-                    # Match each template Y position to closest block in this column
-                    for template_idx, template_y in enumerate(template_y_positions):
-                        closest_block = None
-                        min_y_diff = float("inf")
+                    for block in col_blocks_sorted:
+                        block_center_y = (block["bbox"][1] + block["bbox"][3]) / 2
+                        y_diff = abs(block_center_y - template_y)
 
-                        for block in col_blocks_sorted:
-                            block_center_y = (block["bbox"][1] + block["bbox"][3]) / 2
-                            y_diff = abs(block_center_y - template_y)
+                        if y_diff < min_y_diff and y_diff < 60:  # Within 6% tolerance
+                            min_y_diff = y_diff
+                            closest_block = block
 
-                            if (
-                                y_diff < min_y_diff and y_diff < 60
-                            ):  # Within 6% tolerance
-                                min_y_diff = y_diff
-                                closest_block = block
-
-                        if closest_block:
-                            field_name = (
-                                f"{suggested_field_name}_item_{template_idx + 1}"
-                                if len(template_y_positions) > 1
-                                else suggested_field_name
-                            )
+                    if closest_block:
+                        field_name = (
+                            f"{suggested_field_name}_item_{template_idx + 1}"
+                            if len(template_y_positions) > 1
+                            else suggested_field_name
+                        )
 
-                            extracted_fields.append(
-                                {
-                                    "field_name": field_name,
-                                    "value": closest_block["text"],
-                                    "bbox": closest_block["bbox"],
-                                    "confidence": closest_block["conf"] / 100.0,
-                                    "source": "column_suggestion",
-                                    "column_header": (
-                                        column_header["text"] if column_header else None
-                                    ),
-                                }
-                            )
+                        extracted_fields.append(
+                            {
+                                "field_name": field_name,
+                                "value": closest_block["text"],
+                                "bbox": closest_block["bbox"],
+                                "confidence": closest_block["conf"] / 100.0,
+                                "source": "column_suggestion",
+                                "column_header": (
+                                    column_header["text"] if column_header else None
+                                ),
+                            }
+                        )
 
-                            logger.info(
-                                f"[/apply-template-intelligent] Matched {field_name} = '{closest_block['text']}' "
-                                f"(Y_diff={min_y_diff:.1f})"
-                            )
+                        logger.info(
+                            f"[/apply-template-intelligent] Matched {field_name} = '{closest_block['text']}' "
+                            f"(Y_diff={min_y_diff:.1f})"
+                        )
 
-                logger.info(
-                    f"[/apply-template-intelligent] Extracted {len(extracted_fields)} fields from {len(columns)} columns"
-                )
+            logger.info(
+                f"[/apply-template-intelligent] Extracted {len(extracted_fields)} fields from {len(columns)} columns"
+            )
 
-            else:
-                # CROSS-PAGE TEMPLATE MODE OR NON-TABULAR DOCUMENTS
-                logger.info(
-                    "[/apply-template-intelligent] Cross-page/non-tabular template mode"
-                )
+        else:
+            # CROSS-PAGE TEMPLATE MODE OR NON-TABULAR DOCUMENTS
+            logger.info(
+                "[/apply-template-intelligent] Cross-page/non-tabular template mode"
+            )
 
-                for template in template_fields:
-                    field_name = template.get("field_name", "unknown")
-                    example_value = template.get("value", "")
-                    template_bbox = template.get("bbox", [0, 0, 1000, 1000])
+            for template in template_fields:
+                field_name = template.get("field_name", "unknown")
+                example_value = template.get("value", "")
+                template_bbox = template.get("bbox", [0, 0, 1000, 1000])
 
-                    template_center_y = (template_bbox[1] + template_bbox[3]) / 2
-                    template_center_x = (template_bbox[0] + template_bbox[2]) / 2
+                template_center_y = (template_bbox[1] + template_bbox[3]) / 2
+                template_center_x = (template_bbox[0] + template_bbox[2]) / 2
 
-                    # Strategy 1: Find blocks in similar region (spatial matching)
-                    y_tolerance = 200
-                    x_tolerance = 200
+                # Strategy 1: Find blocks in similar region (spatial matching)
+                y_tolerance = 200
+                x_tolerance = 200
 
-                    candidates = []
-                    for block in text_blocks:
-                        block_center_y = (block["bbox"][1] + block["bbox"][3]) / 2
-                        block_center_x = (block["bbox"][0] + block["bbox"][2]) / 2
+                candidates = []
+                for block in text_blocks:
+                    block_center_y = (block["bbox"][1] + block["bbox"][3]) / 2
+                    block_center_x = (block["bbox"][0] + block["bbox"][2]) / 2
 
-                        y_diff = abs(block_center_y - template_center_y)
-                        x_diff = abs(block_center_x - template_center_x)
+                    y_diff = abs(block_center_y - template_center_y)
+                    x_diff = abs(block_center_x - template_center_x)
 
-                        if y_diff < y_tolerance and x_diff < x_tolerance:
-                            # Accept both numeric and text, but prefer same type
-                            is_numeric = any(c.isdigit() for c in block["text"])
-                            example_is_numeric = any(c.isdigit() for c in example_value)
+                    if y_diff < y_tolerance and x_diff < x_tolerance:
+                        # Accept both numeric and text, but prefer same type
+                        is_numeric = any(c.isdigit() for c in block["text"])
+                        example_is_numeric = any(c.isdigit() for c in example_value)
 
-                            type_match_bonus = (
-                                0.5 if (is_numeric == example_is_numeric) else 0.0
-                            )
-                            distance = (y_diff**2 + x_diff**2) ** 0.5 - (
-                                type_match_bonus * 50
-                            )
-                            candidates.append({"block": block, "distance": distance})
+                        type_match_bonus = (
+                            0.5 if (is_numeric == example_is_numeric) else 0.0
+                        )
+                        distance = (y_diff**2 + x_diff**2) ** 0.5 - (
+                            type_match_bonus * 50
+                        )
+                        candidates.append({"block": block, "distance": distance})
 
-                    # Strategy 2: If no spatial match and LayoutLM available, ask the model
-                    if not candidates and _doc_qa_pipeline and not same_page:
-                        try:
-                            # Convert field_name to human-readable question
-                            question = field_name.replace("_", " ").title()
-                            logger.info(
-                                f"[/apply-template-intelligent] Asking LayoutLM: 'What is the {question}?'"
-                            )
+                # Strategy 2: If no spatial match and LayoutLM available, ask the model
+                if not candidates and _doc_qa_pipeline and not same_page:
+                    try:
+                        # Convert field_name to human-readable question
+                        question = field_name.replace("_", " ").title()
+                        logger.info(
+                            f"[/apply-template-intelligent] Asking LayoutLM: 'What is the {question}?'"
+                        )
 
+                        with torch.inference_mode():
                             result = _doc_qa_pipeline(
-                                image=image, question=f"What is the {question}?"
+                                image=image,
+                                question=f"What is the {question}?",
+                                word_boxes=word_boxes,
                             )
 
-                            if result and isinstance(result, dict):
-                                answer = result.get("answer", "")
-                                answer_score = result.get("score", 0.0)
-
-                                if answer and answer != "None" and answer_score > 0.3:
-                                    # Find the bbox for this answer in OCR results
-                                    for block in text_blocks:
-                                        if (
-                                            answer.lower() in block["text"].lower()
-                                            or block["text"].lower() in answer.lower()
-                                        ):
-                                            extracted_fields.append(
-                                                {
-                                                    "field_name": field_name,
-                                                    "value": answer,
-                                                    "bbox": block["bbox"],
-                                                    "confidence": answer_score,
-                                                    "source": "layoutlm_qa",
-                                                }
-                                            )
-                                            logger.info(
-                                                f"[/apply-template-intelligent] LayoutLM found {field_name} = '{answer}' (score={answer_score:.2f})"
-                                            )
-                                            break
-                        except Exception as e:
-                            logger.warning(
-                                f"[/apply-template-intelligent] LayoutLM Q&A for '{field_name}' failed: {e}"
-                            )
+                        if result and isinstance(result, dict):
+                            answer = result.get("answer", "")
+                            answer_score = result.get("score", 0.0)
+
+                            if answer and answer != "None" and answer_score > 0.3:
+                                # Find the bbox for this answer in OCR results
+                                for block in text_blocks:
+                                    if (
+                                        answer.lower() in block["text"].lower()
+                                        or block["text"].lower() in answer.lower()
+                                    ):
+                                        extracted_fields.append(
+                                            {
+                                                "field_name": field_name,
+                                                "value": answer,
+                                                "bbox": block["bbox"],
+                                                "confidence": answer_score,
+                                                "source": "layoutlm_qa",
+                                            }
+                                        )
+                                        logger.info(
+                                            f"[/apply-template-intelligent] LayoutLM found {field_name} = '{answer}' (score={answer_score:.2f})"
+                                        )
+                                        break
+                    except Exception as e:
+                        logger.warning(
+                            f"[/apply-template-intelligent] LayoutLM Q&A for '{field_name}' failed: {e}"
+                        )
 
-                    # Use best spatial match if found
-                    if candidates:
-                        candidates.sort(key=lambda c: c["distance"])
-                        best = candidates[0]["block"]
+                # Use best spatial match if found
+                if candidates:
+                    candidates.sort(key=lambda c: c["distance"])
+                    best = candidates[0]["block"]
 
-                        extracted_fields.append(
-                            {
-                                "field_name": field_name,
-                                "value": best["text"],
-                                "bbox": best["bbox"],
-                                "confidence": best["conf"] / 100.0,
-                                "source": "template_match",
-                            }
-                        )
+                    extracted_fields.append(
+                        {
+                            "field_name": field_name,
+                            "value": best["text"],
+                            "bbox": best["bbox"],
+                            "confidence": best["conf"] / 100.0,
+                            "source": "template_match",
+                        }
+                    )
 
-            return jsonify(
-                {
-                    "status": "success",
-                    "fields": extracted_fields,
-                    "page": target_page,
-                    "mode": (
-                        "column_detection"
-                        if (same_page and suggest_columns)
-                        else "template_application"
+        return json_response(
+            {
+                "status": "success",
+                "fields": extracted_fields,
+                "page": target_page,
+                "mode": (
+                    "column_detection"
+                    if (same_page and suggest_columns)
+                    else "template_application"
+                ),
+                "debug": {
+                    "total_ocr_blocks": len(text_blocks),
+                    "columns_detected": (
+                        len(columns) if same_page and suggest_columns else 0
                     ),
-                    "debug": {
-                        "total_ocr_blocks": len(text_blocks),
-                        "columns_detected": (
-                            len(columns) if same_page and suggest_columns else 0
-                        ),
-                    },
-                }
-            )
-
-        finally:
-            if tmp_path and os.path.exists(tmp_path):
-                os.unlink(tmp_path)
-            if image_path and os.path.exists(image_path):
-                os.unlink(image_path)
+                },
+            }
+        )
 
     except Exception as e:
         logger.error(f"Error in intelligent template application: {e}", exc_info=True)
@@ -3094,9 +4601,7 @@ def save_vendor_template():
             return jsonify({"error": "vendor_name is required"}), 400
 
         # Sanitize vendor name for filename
-        vendor_name = "".join(
-            c if c.isalnum() or c in "_-" else "_" for c in vendor_name.lower()
-        )
+        vendor_name = sanitize_vendor_name(vendor_name)
 
         template_data = {
             "vendor_name": vendor_name,
@@ -3179,6 +4684,8 @@ def index():
             "version": "1.0.0",
             "endpoints": {
                 "/health": "Health check",
+                "/readyz": "Readiness probe (503 until the model is warmed up)",
+                "/warmup": "Load the model and run a dummy inference (POST)",
                 "/extract": "Extract fields from document (POST with base64 image)",
                 "/extract-batch": "Extract fields in batches to avoid CPU overload (POST with batch_index)",
                 "/reextract-bbox": "Re-extract text from specific bbox (POST with image + bbox)",
@@ -3194,9 +4701,13 @@ def index():
     )
 
 
+# Local development server - the container runs gunicorn (see Dockerfile)
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 3002))
     logger.info(f"Starting Donut service on port {port}")
-    logger.info("Note: Model will be loaded on first request (may take 30-60s)")
+    if PRELOAD_MODEL:
+        start_background_warmup()
+    else:
+        logger.info("Note: Model will be loaded on first request (may take 30-60s)")
 
     app.run(host="0.0.0.0", port=port, debug=False, threaded=True)
@@ -0,0 +1,149 @@
+"""
+Tests for the LayoutLM service helpers.
+
+Run from donut_service/: python -m pytest test_main.py
+The LayoutLM model is not loaded (PRELOAD_MODEL=0).
+"""
+
+import os
+from difflib import SequenceMatcher
+
+os.environ["PRELOAD_MODEL"] = "0"
+
+import pytest
+from PIL import Image
+
+import main
+
+# OCR-style label and value strings, with typical misreads (O/0, l/1, S/5)
+OCR_CHOICES = [
+    "Invoice No:",
+    "lnvoice N0.",
+    "INV-2024-00153",
+    "Invoice Date",
+    "12/03/2024",
+    "Total Amount Due",
+    "TOTAL:",
+    "$1,234.50",
+    "Description",
+    "Qty",
+    "Unit Price",
+    "Amount",
+    "Bill To:",
+    "ACME C0RP0RATI0N",
+]
+
+OCR_QUERIES = [
+    "invoice number",
+    "Invoice No",
+    "INV-2024-0O153",
+    "date",
+    "12/O3/2O24",
+    "total amount",
+    "1234.50",
+    "description",
+    "quantity",
+    "unit price",
+    "ACME Corporation",
+    "",
+]
+
+
+def sequence_matcher_best(query, choices):
+    scores = [SequenceMatcher(None, query, choice).ratio() for choice in choices]
+    index = max(range(len(scores)), key=scores.__getitem__)
+    return index, scores[index]
+
+
+@pytest.fixture(params=["rapidfuzz", "difflib"])
+def fuzzy_backend(request, monkeypatch):
+    """Run a test with and without the rapidfuzz bounds."""
+    if request.param == "rapidfuzz":
+        if main.process is None:
+            pytest.skip("rapidfuzz is not installed")
+    else:
+        monkeypatch.setattr(main, "process", None)
+    return request.param
+
+
+@pytest.mark.parametrize("query", OCR_QUERIES)
+def test_best_fuzzy_match_is_sequence_matcher_ratio(fuzzy_backend, query):
+    assert main.best_fuzzy_match(query, OCR_CHOICES) == sequence_matcher_best(
+        query, OCR_CHOICES
+    )
+
+
+def test_best_fuzzy_matches_is_sequence_matcher_ratio(fuzzy_backend):
+    assert main.best_fuzzy_matches(OCR_QUERIES, OCR_CHOICES) == [
+        sequence_matcher_best(query, OCR_CHOICES) for query in OCR_QUERIES
+    ]
+
+
+def test_best_fuzzy_match_without_choices(fuzzy_backend):
+    assert main.best_fuzzy_match("total", []) == (None, 0.0)
+
+
+# A page with one confidently read invoice number at a known position
+PAGE_SIZE = (1000, 1000)
+PAGE_WORDS = [
+    {"text": "Invoice", "bbox": [100, 100, 180, 120], "confidence": 0.95},
+    {"text": "No:", "bbox": [190, 100, 230, 120], "confidence": 0.95},
+    {"text": "INV-2024-00153", "bbox": [240, 100, 400, 120], "confidence": 0.95},
+]
+INVOICE_NUMBER_FIELD = {
+    "key": "invoice_number",
+    "question": "What is the invoice number?",
+    "category": "invoice",
+}
+
+
+@pytest.fixture
+def fake_page(monkeypatch):
+    """Serve PAGE_WORDS as the page's OCR and answer every question from them."""
+
+    def doc_qa(inputs, batch_size=None, **kwargs):
+        return [{"answer": "INV-2024-00153", "score": 0.9} for _ in inputs]
+
+    monkeypatch.setattr(main, "load_layoutlm_model", lambda: doc_qa)
+    monkeypatch.setattr(
+        main, "perform_ocr_get_words", lambda image, page_key=None: PAGE_WORDS
+    )
+    return Image.new("RGB", PAGE_SIZE, "white")
+
+
+def test_template_fields_match_layoutlm_field_schema(fake_page):
+    template = {
+        "vendor_name": "acme_corp",
+        "fields": [{"field_name": "invoice_number", "bbox": [230, 90, 410, 130]}],
+    }
+
+    from_template = main.extract_fields_with_donut(
+        fake_page, [INVOICE_NUMBER_FIELD], template=template
+    )
+    from_layoutlm = main.extract_fields_with_donut(fake_page, [INVOICE_NUMBER_FIELD])
+
+    assert from_template["raw_output"]["mode"] == "template"
+    assert from_layoutlm["raw_output"]["mode"] == "layoutlm_qa"
+    assert from_template["fields"][0]["value"] == "INV-2024-00153"
+    assert from_template["fields"][0]["is_line_item"] is False
+    assert from_template["fields"][0]["row_index"] is None
+    assert set(from_template["fields"][0]) == set(from_layoutlm["fields"][0])
+
+
+def test_template_fields_keep_line_item_metadata(fake_page):
+    template = {
+        "vendor_name": "acme_corp",
+        "fields": [
+            {
+                "field_name": "description_row_2",
+                "bbox": [230, 90, 410, 130],
+                "is_line_item": True,
+                "row_index": 2,
+            }
+        ],
+    }
+
+    fields = main.extract_fields_from_template(PAGE_WORDS, PAGE_SIZE, template)
+
+    assert fields[0]["is_line_item"] is True
+    assert fields[0]["row_index"] == 2